@@ -0,0 +1,223 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+# frames are only written to files, no interactive window
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+import config
+import values
+from aggregate_type import AggregateType
+from backup_store import BackupStore
+from factory_data import FactoryData
+from general_data import GeneralData
+from history_data import HistoryData
+from plot_data import PlotData, CumulativePlotData
+from plot_parser import get_plot_lines, parse_point_columns
+from refresh_aggregates import RefreshAggregates
+from string_helper import print_line
+from summary_helper import get_factory_configuration_table, get_warehouse_summary, get_factory_summary, \
+    get_pending_orders_summary, get_pending_transport_summary
+from team_standing_data import TeamStandingData
+from values import Category
+
+
+class ReplayResult:
+    snapshot_name: str
+    day: int
+    error: str
+
+    def __init__(self, snapshot_name: str, day: int = None, error: str = None):
+        self.snapshot_name = snapshot_name
+        self.day = day
+        self.error = error
+
+
+class SnapshotReplay:
+    """
+    Everything the refresh loop gets from one snapshot. Pages missing in the snapshot are left empty.
+    """
+    store: BackupStore
+    snapshot_name: str
+    general_data: GeneralData
+    plot_data: dict[str, list[PlotData]]
+    standings: list[tuple[str, float]]
+    history: HistoryData
+    list_factory_data: list[FactoryData]
+
+    def __init__(self, store: BackupStore, snapshot_name: str):
+        self.store = store
+        self.snapshot_name = snapshot_name
+        self.general_data = None
+        self.plot_data = {}
+        self.standings = []
+        self.history = None
+        self.list_factory_data = []
+
+    def get_response(self, url: str) -> str:
+        return self.store.get_response_from_snapshot(url, self.snapshot_name)
+
+    def load(self):
+        response_text = self.get_response("https://op.responsive.net/SupplyChain/SCAccess")
+        if response_text is None:
+            raise Exception(f"Backup {self.snapshot_name} does not contain the general data!")
+        self.general_data = GeneralData.from_web_response(response_text)
+
+        for url, name, category in values.get_plot_requests():
+            response_text = self.get_response(url)
+            data_list = []
+            if response_text is not None:
+                for data_name, point_text in get_plot_lines(response_text, name):
+                    data_list.append(PlotData.from_columns(data_name, category, *parse_point_columns(point_text)))
+            if category == Category.CASH:
+                for x in data_list:
+                    x.multiply_all_y()
+            self.plot_data[name] = data_list
+
+        response_text = self.get_response("https://op.responsive.net/SupplyChain/SCStanding")
+        if response_text is not None:
+            self.standings = TeamStandingData.get_standings_from_web_response(response_text)
+
+        response_text = self.get_response("https://op.responsive.net/SupplyChain/SCHistory?isAdmin=undefined")
+        if response_text is not None:
+            self.history = HistoryData()
+            self.history.init_from_web_response(response_text)
+
+        for r in range(1, len(values.list_of_regions) + 1):
+            response_text = self.get_response(
+                f"https://op.responsive.net/SupplyChain/SCFactory?action=change&region={r}")
+            if response_text is None:
+                self.list_factory_data.append(None)
+                continue
+            fd = FactoryData()
+            fd.name = values.list_of_regions[r - 1]
+            self.list_factory_data.append(fd.init_from_web_response(response_text))
+        return self
+
+    def get_plot_list(self, name_suffix: str) -> list[list[PlotData]]:
+        return [self.plot_data[f"{region} {name_suffix}"] for region in values.list_of_regions]
+
+    """
+    Same aggregation as the refresh loop, the running total of the lost demand starts with this snapshot
+    """
+
+    def get_aggregates(self, from_day: int) -> dict[str, PlotData]:
+        aggregates = RefreshAggregates(self.plot_data["Demand"], self.plot_data["Lost demand"],
+                                       self.get_plot_list("WIP"), self.get_plot_list("Inventory"), from_day,
+                                       CumulativePlotData())
+        cash_balance = self.plot_data["Cash balance"]
+
+        return {
+            "Total Demand": aggregates.demand_total,
+            "Total Lost Demand": aggregates.lost_demand_total,
+            "Total Cumulated Lost Demand": aggregates.lost_demand_cumulated,
+            "Total WIP": aggregates.wip_total,
+            "Total Inventory": aggregates.inventory_total,
+            "Cash balance": cash_balance[0] if len(cash_balance) > 0 else PlotData.from_columns(
+                "Cash balance", Category.CASH, [], []),
+        }
+
+    def get_summary(self, aggregates: dict[str, PlotData]) -> str:
+        current_day = self.general_data.day
+        state = [f"Snapshot {self.snapshot_name}, Day {current_day}, Cash {self.general_data.cash}"]
+        for name, pd in aggregates.items():
+            state.append(f"{name}: {pd.y[-1] if len(pd.y) > 0 else values.Placeholders.empty}")
+        for name, value in self.standings:
+            state.append(f"Standing {name}: {value}")
+
+        out = ["\n".join(state)]
+        if self.history is not None:
+            out.append(get_warehouse_summary(self.history.get_pending_warehouse_modification(current_day), current_day))
+            out.append(get_factory_summary(self.history.get_pending_factory_modification(current_day), current_day))
+        out.append(get_factory_configuration_table(self.list_factory_data))
+        out.append(get_pending_orders_summary(self.get_plot_list("WIP")))
+        out.append(get_pending_transport_summary(self.get_plot_list("Inventory"), current_day))
+        return "\n\n".join(out)
+
+    def render_frame(self, aggregates: dict[str, PlotData], from_day: int, path: str):
+        figure, axis = plt.subplots(2, 3, figsize=(19.2, 10.8))
+        figure.suptitle(f"OVERVIEW ({self.snapshot_name}, Tag {self.general_data.day})", fontsize=16)
+
+        names = ["Total Demand", "Total Lost Demand", "Total Cumulated Lost Demand",
+                 "Total WIP", "Total Inventory", "Cash balance"]
+        for ax, name in zip(axis.flat, names):
+            pd = aggregates[name]
+            ax.plot(pd.get_from_day_x(from_day), pd.get_from_day_y(from_day), label=pd.name)
+            ax.set_title(name)
+            ax.grid(True)
+
+        # smoothed demand as in the overview
+        smoothed_x, smoothed_y = aggregates["Total Demand"].get_from_day_smoothed(from_day, 14, AggregateType.AVG)
+        axis[0, 0].plot(smoothed_x, smoothed_y, label="Smoothed (14 days)")
+        axis[0, 0].legend()
+
+        figure.savefig(path)
+        plt.close(figure)
+
+
+def replay_snapshot(root_path: str, snapshot_name: str, output_path: str, last_x_days: int,
+                    render_frames: bool) -> ReplayResult:
+    try:
+        replay = SnapshotReplay(BackupStore(root_path), snapshot_name).load()
+        from_day: int = replay.general_data.day - last_x_days
+        aggregates = replay.get_aggregates(from_day)
+
+        with open(os.path.join(output_path, f"{snapshot_name}.txt"), 'w', newline='') as f:
+            f.write(replay.get_summary(aggregates))
+        if render_frames:
+            replay.render_frame(aggregates, from_day, os.path.join(output_path, f"{snapshot_name}.png"))
+        return ReplayResult(snapshot_name, replay.general_data.day)
+    except Exception as e:
+        return ReplayResult(snapshot_name, error=repr(e))
+
+
+def get_snapshot_names_in_range(store: BackupStore, from_name: str = None, to_name: str = None) -> list[str]:
+    # snapshot names are timestamps, so the string order is the time order
+    return [n for n in store.get_snapshot_names()
+            if (from_name is None or n >= from_name) and (to_name is None or n <= to_name)]
+
+
+def replay_backups(root_path: str, output_path: str, from_name: str = None, to_name: str = None,
+                   render_frames: bool = False, max_workers: int = None) -> list[ReplayResult]:
+    snapshot_names = get_snapshot_names_in_range(BackupStore(root_path), from_name, to_name)
+    os.makedirs(output_path, exist_ok=True)
+    print_line(f"Replaying {len(snapshot_names)} snapshots from {root_path}")
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for result in executor.map(replay_snapshot, [root_path] * len(snapshot_names), snapshot_names,
+                                   [output_path] * len(snapshot_names), [config.lastXDays] * len(snapshot_names),
+                                   [render_frames] * len(snapshot_names)):
+            if result.error is not None:
+                print_line(f"Snapshot {result.snapshot_name} failed: {result.error}")
+            results.append(result)
+    duration = time.perf_counter() - start
+
+    num_failed = sum(1 for r in results if r.error is not None)
+    print_line(f"Replayed {len(results) - num_failed} snapshots ({num_failed} failed) in {duration:.2f} s "
+               f"({len(results) / duration if duration > 0 else 0:.2f} snapshots/s)")
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser("Replay of Supply Chain Game backups")
+    arg_parser.add_argument('-b', nargs='?', type=str, default=values.FilePaths.website_backup_directory,
+                            help="Backup directory")
+    arg_parser.add_argument('-o', nargs='?', type=str, default=config.replay_output_directory,
+                            help="Output directory")
+    arg_parser.add_argument('-from', nargs='?', type=str, dest="from_name", help="First snapshot (inclusive)")
+    arg_parser.add_argument('-to', nargs='?', type=str, dest="to_name", help="Last snapshot (inclusive)")
+    arg_parser.add_argument('-n', nargs='?', type=int, help="Number of days")
+    arg_parser.add_argument('-w', nargs='?', type=int, help="Number of worker processes")
+    arg_parser.add_argument('-frames', action="store_true", help="Render an overview frame per snapshot")
+    args = arg_parser.parse_args()
+
+    if args.n is not None:
+        config.lastXDays = args.n
+
+    replay_backups(args.b, args.o, args.from_name, args.to_name, args.frames, args.w)
@@ -0,0 +1,335 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import zlib
+
+import config
+from string_helper import print_line
+
+
+def get_escaped_url_for_filesave(url: str) -> str:
+    return url.replace(':', '_').replace('/', '_').replace('?', '_') + ".html"
+
+
+def write_file_atomic(path: str, content: bytes, sync: bool = False):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+"""
+Flushes the files and then their directories once, so the renames of write_file_atomic are on disk as well.
+Windows can only flush files opened for writing and has no directory handles to flush.
+"""
+
+
+def sync_files(paths: list[str]):
+    mode = 'rb' if os.name == "posix" else 'rb+'
+    directories = set()
+    for path in paths:
+        with open(path, mode) as f:
+            os.fsync(f.fileno())
+        directories.add(os.path.dirname(path))
+
+    if os.name != "posix":
+        return
+    for directory in directories:
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class BackupIndex:
+    """
+    Newest snapshot per url (key: escaped url file name), persisted in the backup directory.
+    Snapshots written since the index was saved are added when it is loaded.
+    """
+    path: str
+    snapshot_names: set[str]
+    newest_snapshots: dict[str, str]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.snapshot_names = set()
+        self.newest_snapshots = {}
+
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                content = json.load(f)
+            self.snapshot_names = set(content["snapshots"])
+            self.newest_snapshots = content["newest"]
+
+    def add_snapshot(self, snapshot_name: str, urls: list[str]):
+        self.snapshot_names.add(snapshot_name)
+        for url in urls:
+            file_name = get_escaped_url_for_filesave(url)
+            if self.newest_snapshots.get(file_name, "") <= snapshot_name:
+                self.newest_snapshots[file_name] = snapshot_name
+
+    def get_newest_snapshot(self, url: str) -> str:
+        return self.newest_snapshots.get(get_escaped_url_for_filesave(url))
+
+    def save(self):
+        content = {"snapshots": sorted(self.snapshot_names), "newest": self.newest_snapshots}
+        write_file_atomic(self.path, json.dumps(content, indent=1).encode())
+
+
+class BackupStore:
+    """
+    Content addressed backups: every distinct response body is stored once, compressed, in objects/<hash>.
+    A snapshot is a manifest snapshots/<snapshot_name>.json mapping each url to the hash of its body.
+    Backups of the old format (one folder per snapshot with one .html file per url) can still be read.
+    """
+    root_path: str
+    objects_path: str
+    snapshots_path: str
+    manifests: dict[str, dict[str, str]]
+    loaded_manifests: dict[str, dict[str, str]]
+    index: BackupIndex
+
+    def __init__(self, root_path: str):
+        self.root_path = root_path
+        self.objects_path = os.path.join(root_path, "objects")
+        self.snapshots_path = os.path.join(root_path, "snapshots")
+        self.manifests = {}
+        self.loaded_manifests = {}
+        self.index = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_hash(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    def get_object_path(self, content_hash: str) -> str:
+        return os.path.join(self.objects_path, content_hash[:2], content_hash)
+
+    def get_manifest_path(self, snapshot_name: str) -> str:
+        return os.path.join(self.snapshots_path, snapshot_name + ".json")
+
+    """
+    Stores the body (if not stored yet) and adds it to the manifest of the snapshot, which is written by
+    finish_snapshot(). Returns the path of the object if it was written, None if it already existed.
+    """
+
+    def store_response(self, snapshot_name: str, url: str, text: str) -> str:
+        content = text.encode()
+        content_hash = self.get_hash(content)
+
+        object_path = self.get_object_path(content_hash)
+        written = not os.path.exists(object_path)
+        if written:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            write_file_atomic(object_path, zlib.compress(content))
+
+        with self.lock:
+            if snapshot_name not in self.manifests:
+                self.manifests[snapshot_name] = {}
+            self.manifests[snapshot_name][url] = content_hash
+        return object_path if written else None
+
+    """
+    Writes the manifest of the snapshot. If the snapshot was finished before, the responses stored since then are added
+    to its manifest.
+    """
+
+    def finish_snapshot(self, snapshot_name: str, sync: bool = False):
+        with self.lock:
+            manifest = self.manifests.pop(snapshot_name, None)
+        if manifest is None:
+            return
+        written_manifest = self.read_manifest(snapshot_name)
+        if written_manifest is not None:
+            manifest = {**written_manifest, **manifest}
+
+        os.makedirs(self.snapshots_path, exist_ok=True)
+        manifest_path = self.get_manifest_path(snapshot_name)
+        write_file_atomic(manifest_path, json.dumps(manifest, indent=1).encode(), sync)
+        if sync:
+            sync_files([manifest_path])
+        with self.lock:
+            self.loaded_manifests[snapshot_name] = manifest
+
+        with self.lock:
+            if self.index is not None:
+                self.index.add_snapshot(snapshot_name, list(manifest))
+                self.index.save()
+
+    """
+    Loads the index and adds all snapshots missing in it, so this only scans the backups written since the last run
+    """
+
+    def get_index(self) -> BackupIndex:
+        with self.lock:
+            if self.index is None:
+                index = BackupIndex(os.path.join(self.root_path, "index.json"))
+                missing_snapshot_names = [n for n in self.get_snapshot_names() if n not in index.snapshot_names]
+                for name in missing_snapshot_names:
+                    index.add_snapshot(name, self.get_snapshot_urls(name))
+                if len(missing_snapshot_names) > 0:
+                    index.save()
+                self.index = index
+            return self.index
+
+    def get_snapshot_urls(self, snapshot_name: str) -> list[str]:
+        manifest = self.read_manifest(snapshot_name)
+        if manifest is not None:
+            return list(manifest)
+
+        # old format only contains the escaped file names, which are the keys of the index anyway
+        directory_path = os.path.join(self.root_path, snapshot_name)
+        return [f.name[:-len(".html")] for f in os.scandir(directory_path) if f.name.endswith(".html")]
+
+    def read_object(self, content_hash: str) -> str:
+        with open(self.get_object_path(content_hash), 'rb') as f:
+            return zlib.decompress(f.read()).decode()
+
+    def read_manifest(self, snapshot_name: str) -> dict[str, str]:
+        if snapshot_name in self.loaded_manifests:
+            return self.loaded_manifests[snapshot_name]
+
+        manifest_path = self.get_manifest_path(snapshot_name)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        # manifests are only changed by finish_snapshot(), which updates the loaded manifest
+        self.loaded_manifests[snapshot_name] = manifest
+        return manifest
+
+    def get_snapshot_names(self) -> list[str]:
+        names = set()
+        if os.path.exists(self.snapshots_path):
+            names.update(f.name[:-len(".json")] for f in os.scandir(self.snapshots_path) if f.name.endswith(".json"))
+        if os.path.exists(self.root_path):
+            names.update(f.name for f in os.scandir(self.root_path)
+                         if f.is_dir() and f.path not in (self.objects_path, self.snapshots_path))
+        return sorted(names)
+
+    """
+    Returns None if the snapshot does not contain the url
+    """
+
+    def get_response_from_snapshot(self, url: str, snapshot_name: str) -> str:
+        manifest = self.read_manifest(snapshot_name)
+        if manifest is not None:
+            return self.read_object(manifest[url]) if url in manifest else None
+
+        # old format
+        file_path = os.path.join(self.root_path, snapshot_name, get_escaped_url_for_filesave(url))
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, "r") as f:
+            return f.read()
+
+    # if no snapshot specified, the newest snapshot containing the url will be used
+    def get_response(self, url: str, snapshot_name: str = None) -> str:
+        if snapshot_name is not None:
+            if snapshot_name not in self.get_index().snapshot_names:
+                raise Exception(f"Backup {snapshot_name} not found in {self.root_path}!")
+            out = self.get_response_from_snapshot(url, snapshot_name)
+            if out is None:
+                raise Exception(f"Backup {snapshot_name} does not contain {url}!")
+            return out
+
+        snapshot_name = self.get_index().get_newest_snapshot(url)
+        if snapshot_name is None:
+            return None
+        return self.get_response_from_snapshot(url, snapshot_name)
+
+
+class BackupWriter:
+    """
+    Writes backups on a background thread, so the refresh loop does not wait for the disk.
+    The responses of a snapshot are collected and written together when the snapshot is finished: the new objects
+    are synced to disk before the manifest is written. If more than config.backup_max_pending_bytes are collected,
+    they are written right away, so memory stays bounded and a slow disk fills the queue. If the queue stays full for
+    config.backup_queue_timeout seconds, responses are dropped with a warning, finishing a snapshot always waits.
+    """
+    store: BackupStore
+    queue: queue.Queue
+    thread: threading.Thread
+    dropped: int
+    # only used by the writer thread
+    pending: dict[str, list[tuple[str, str]]]
+    pending_bytes: int
+    written_paths: dict[str, list[str]]
+
+    def __init__(self, store: BackupStore, max_queue_size: int = None):
+        if max_queue_size is None:
+            max_queue_size = config.backup_queue_size
+        self.store = store
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.dropped = 0
+        self.pending = {}
+        self.pending_bytes = 0
+        self.written_paths = {}
+        self.thread = threading.Thread(target=self.run, name="BackupWriter", daemon=True)
+        self.thread.start()
+
+    def add_response(self, snapshot_name: str, url: str, text: str):
+        try:
+            self.queue.put((snapshot_name, url, text), timeout=config.backup_queue_timeout)
+        except queue.Full:
+            self.dropped += 1
+            print_line(f"WARNING: Backup queue full, dropped backup of {url} ({self.dropped} dropped so far)")
+
+    def finish_snapshot(self, snapshot_name: str):
+        self.queue.put((snapshot_name, None, None))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                # finish everything not finished yet
+                for snapshot_name in set(self.pending) | set(self.written_paths):
+                    self.finish_pending_snapshot(snapshot_name)
+                return
+
+            snapshot_name, url, text = item
+            if url is None:
+                self.finish_pending_snapshot(snapshot_name)
+                continue
+
+            self.pending.setdefault(snapshot_name, []).append((url, text))
+            self.pending_bytes += len(text)
+            if self.pending_bytes > config.backup_max_pending_bytes:
+                for name in list(self.pending):
+                    self.write_pending_responses(name)
+
+    def write_pending_responses(self, snapshot_name: str):
+        responses = self.pending.pop(snapshot_name, [])
+        written_paths = self.written_paths.setdefault(snapshot_name, [])
+        for url, text in responses:
+            self.pending_bytes -= len(text)
+            try:
+                object_path = self.store.store_response(snapshot_name, url, text)
+            except Exception as e:
+                print_line(f"WARNING: Backup of {url} could not be written: {e!r}")
+                continue
+            if object_path is not None:
+                written_paths.append(object_path)
+
+    def finish_pending_snapshot(self, snapshot_name: str):
+        try:
+            self.write_pending_responses(snapshot_name)
+            sync_files(self.written_paths.pop(snapshot_name, []))
+            self.store.finish_snapshot(snapshot_name, True)
+        except Exception as e:
+            print_line(f"WARNING: Backup {snapshot_name} could not be written: {e!r}")
+
+    """
+    Writes and finishes everything queued so far and stops the thread
+    """
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Micro benchmarks on synthetic game data, run with: python benchmarks.py
+Every benchmark checks that the compared implementations return the same results.
+"""
+import random
+import timeit
+import tracemalloc
+
+import values
+from aggregate_type import AggregateType
+from history_data import HistoryData, HistoryDataDefault
+from plot_data import PlotData
+from plot_data_cache import PlotDataCache
+from plot_parser import get_plot_lines, parse_point_columns
+from smoothing_type import SmoothingType
+from string_helper import get_index
+from values import HistoryOperationTypes, get_history_operation_type
+
+
+def print_benchmark(name: str, seconds_before: float, seconds_after: float):
+    print(f"{name}: {seconds_before * 1000:.3f} ms -> {seconds_after * 1000:.3f} ms "
+          f"({seconds_before / seconds_after:.1f}x)")
+
+
+def get_synthetic_points(num_of_days: int = 1460, points_per_day: int = 4) -> list[tuple[float, float]]:
+    points = []
+    value = 0.0
+    for day in range(num_of_days):
+        for i in range(points_per_day):
+            value = max(0.0, value + random.randint(-50, 50))
+            points.append((round(day + i / points_per_day, 2), value))
+    return points
+
+
+def get_synthetic_plot_response(num_of_days: int = 1460, num_of_lines: int = 3, points_per_day: int = 4) -> str:
+    lines = []
+    for i in range(num_of_lines):
+        point_text = " ".join(f"{x} {y}" for x, y in get_synthetic_points(num_of_days, points_per_day))
+        lines.append(f"{{label: 'Line {i}', points:'{point_text}'}},")
+    return f"<script>var plot = {{lines:[{''.join(lines)}], xlabel: 'day'}}</script>"
+
+
+def parse_points_legacy(point_text: str) -> list[list[float]]:
+    """
+    Point parsing as it was done in get_plot_data before
+    """
+    point_list = point_text.split(' ')
+    ret_list = []
+    ret_list = [-1] * int(len(point_list) / 2)
+    for i in range(0, len(ret_list)):
+        ret_list[i] = []
+        ret_list[i].append(float(point_list[i * 2]))
+        ret_list[i].append(float(point_list[i * 2 + 1]))
+    return ret_list
+
+
+def benchmark_plot_parser(number: int = 20):
+    check_plot_data_cache_merge()
+    point_texts = [l[1] for l in get_plot_lines(get_synthetic_plot_response(), "Synthetic")]
+
+    for point_text in point_texts:
+        x, y = parse_point_columns(point_text)
+        legacy = parse_points_legacy(point_text)
+        assert legacy == [[x[i], y[i]] for i in range(len(x))]
+
+    before = timeit.timeit(lambda: [parse_points_legacy(t) for t in point_texts], number=number) / number
+    after = timeit.timeit(lambda: [parse_point_columns(t) for t in point_texts], number=number) / number
+    print_benchmark(f"Parse {len(point_texts)} lines of {len(parse_points_legacy(point_texts[0]))} points", before, after)
+
+
+def check_plot_data_cache_merge():
+    """
+    Merging the appended points has to give the same data as parsing the whole response, also for step series that
+    repeat the x of the last known point
+    """
+    point_texts = ["1 10 2 10 3 10", "1 10 2 10 3 10 3 25 4 25", "1 10 2 10 3 10 3 25 4 25 4 30 4 31 5 31"]
+    cache = PlotDataCache()
+    for point_text in point_texts:
+        response_text = f"lines:[{{label: 'Step', points:'{point_text}'}},],"
+        merged = cache.get_plot_data("step", response_text, "Step", "BENCHMARK")[0]
+        parsed = PlotData.from_columns("Step", "BENCHMARK", *parse_point_columns(point_text))
+        assert merged.x.tolist() == parsed.x.tolist() and merged.y.tolist() == parsed.y.tolist()
+    assert cache.incremental_parses == 2
+
+
+def get_from_day_y_legacy(points: list[list[float]], from_day: int) -> list[float]:
+    """
+    Window query as it was done by PlotData.get_from_day_points and get_from_day_y before
+    """
+    i = 0
+    points = sorted(points, key=lambda l: l[0])
+    for i in reversed(range(len(points))):
+        if points[i][0] < from_day:
+            i += 1
+            break
+    ret = []
+    for x in points[i:]:
+        ret.append(x[1])
+    return ret
+
+
+def check_smoothing_short_series():
+    """
+    Every smoothing has to return one value per day, also for series shorter than the smoothing window
+    """
+    for num_of_days in (0, 1, 2, 5, 13, 30):
+        pd = PlotData("Synthetic", "BENCHMARK", [[x, y] for x, y in get_synthetic_points(num_of_days, 2)])
+        for smoothing_type in SmoothingType:
+            for centered in (True, False):
+                x, y = pd.get_from_day_smoothed(0, 14, AggregateType.AVG, smoothing_type, centered)
+                assert len(x) == len(y) == len(pd.get_from_day_aggregated_by_day(0, AggregateType.AVG)[0])
+
+
+def benchmark_from_day_queries(number: int = 5, num_of_series: int = 15, queries_per_series: int = 40):
+    """
+    One refresh queries the same window of every plotted series many times (labels, limits, plots)
+    """
+    check_smoothing_short_series()
+    series = [[[x, y] for x, y in get_synthetic_points()] for i in range(num_of_series)]
+    plot_data = [PlotData("Synthetic", "BENCHMARK", s) for s in series]
+    from_day = 1460 - 30
+
+    for i in range(num_of_series):
+        assert get_from_day_y_legacy(series[i], from_day) == plot_data[i].get_from_day_y(from_day).tolist()
+
+    def refresh_legacy():
+        for s in series:
+            for q in range(queries_per_series):
+                get_from_day_y_legacy(s, from_day)
+
+    def refresh():
+        for pd in plot_data:
+            # every refresh gets new data, so the memoized windows are invalidated
+            pd.set_columns(pd.x, pd.y)
+            for q in range(queries_per_series):
+                pd.get_from_day_y(from_day)
+
+    before = timeit.timeit(refresh_legacy, number=number) / number
+    after = timeit.timeit(refresh, number=number) / number
+    print_benchmark(f"{num_of_series * queries_per_series} window queries per refresh", before, after)
+
+
+def get_synthetic_history_response(num_of_rows: int = 2000) -> str:
+    operations = ["Schedule factory expansion", "Schedule warehouse expansion", "Change order point"]
+    rows = []
+    day = 1.0
+    for i in range(num_of_rows):
+        day += random.choice([0, 0, 1])
+        rows.append(f"<tr><td align=right>{day:,}</td><td align=left>Change {i}</td>"
+                    f"<td align=left>{random.choice(operations)}</td><td align=left>Factory {i % 5}</td>"
+                    f"<td align=left>Warehouse {i % 5}</td><td align=right>{i * 10}</td></tr>")
+    return f"<table><thead><tr><th>Day</th></tr></thead><tbody>{''.join(rows)}</tbody></table>"
+
+
+def check_history_parser_malformed_row():
+    """
+    A row with a missing cell must be skipped, not merged with the row after it
+    """
+    response_text = ("<table><thead><tr><th>Day</th></tr></thead><tbody>"
+                     "<tr><td align=right>1</td><td align=left>Broken</td><td align=left>Order point</td></tr>"
+                     "<tr><td align=right>2</td><td align=left>Change</td><td align=left>Order point</td>"
+                     "<td align=left>Factory</td><td align=left>Warehouse</td><td align=right>10</td></tr>"
+                     "</tbody></table>")
+    rows = list(HistoryData.iter_rows_from_web_response(response_text))
+    assert [r.get_key() for r in rows] == [(2.0, "Change", "Order point", "Factory", "Warehouse", "10")]
+
+
+def parse_history_legacy(t: str) -> tuple[list[HistoryDataDefault], dict]:
+    """
+    Parser as it was done by HistoryData.init_from_web_response before, with the rows grouped by operation
+    """
+    all_data = []
+    start1 = get_index(t, "</thead>")
+    start1 = get_index(t, "<tr>", start1, True)
+    end1 = get_index(t, "</tbody>", start1)
+
+    history_string_list = t[start1:end1].split("</tr>")
+    history_string_list.pop(-1)
+
+    for x in history_string_list:
+        hd = HistoryDataDefault()
+        s = get_index(x, "right>", 0, True)
+        e = get_index(x, "</td>", s)
+        hd.day = float(x[s:e].replace(',', ''))
+        s = get_index(x, "left>", e, True)
+        e = get_index(x, "</td>", s)
+        hd.text = x[s:e]
+        s = get_index(x, "left>", e, True)
+        e = get_index(x, "</td>", s)
+        hd.operation_text = x[s:e]
+        hd.operation = get_history_operation_type(hd.operation_text)
+        s = get_index(x, "left>", e, True)
+        e = get_index(x, "</td>", s)
+        hd.factory = x[s:e]
+        s = get_index(x, "left>", e, True)
+        e = get_index(x, "</td>", s)
+        hd.warehouse = x[s:e]
+        s = get_index(x, "right>", e, True)
+        e = get_index(x, "</td>", s)
+        hd.value = x[s:e]
+        all_data.append(hd)
+
+    data_by_operation = {}
+    for d in all_data:
+        if d.operation not in data_by_operation:
+            data_by_operation[d.operation] = []
+        data_by_operation[d.operation].append(d)
+    return all_data, data_by_operation
+
+
+def benchmark_history_parser(number: int = 20):
+    """
+    The history page is requested on every refresh, usually with no or a few new rows
+    """
+    check_history_parser_malformed_row()
+    response_text = get_synthetic_history_response()
+
+    legacy_rows, _ = parse_history_legacy(response_text)
+    full = HistoryData()
+    full.init_from_web_response(response_text)
+    assert [x.get_key() for x in full.all_data] == [x.get_key() for x in legacy_rows]
+
+    before = timeit.timeit(lambda: parse_history_legacy(response_text), number=number) / number
+    after = timeit.timeit(lambda: HistoryData().init_from_web_response(response_text), number=number) / number
+    print_benchmark(f"Parse history page of {len(full.all_data)} rows", before, after)
+
+    history = HistoryData()
+    history.init_from_web_response(response_text)
+    assert history.update_from_web_response(response_text) == 0
+    assert [x.get_key() for x in history.all_data] == [x.get_key() for x in full.all_data]
+
+    after = timeit.timeit(lambda: history.update_from_web_response(response_text), number=number) / number
+    print_benchmark(f"Refresh unchanged history page of {len(full.all_data)} rows", before, after)
+
+
+def get_data_by_operation_from_date_legacy(history: HistoryData, o, from_date: float) -> list:
+    """
+    Scan as it was done by HistoryData.get_data_by_operation_from_date before
+    """
+    ret = []
+    for x in history.all_data:
+        if x.operation == o and int(x.day) >= from_date:
+            ret.append(x)
+    return ret
+
+
+def benchmark_history_queries(number: int = 200):
+    history = HistoryData()
+    history.init_from_web_response(get_synthetic_history_response(20000))
+    operations = list(history.data_by_operation)
+    from_date = history.last_day - 90
+
+    for o in operations:
+        assert get_data_by_operation_from_date_legacy(history, o, from_date) == \
+               history.get_data_by_operation_from_date(o, from_date)
+
+    before = timeit.timeit(lambda: [get_data_by_operation_from_date_legacy(history, o, from_date)
+                                    for o in operations], number=number) / number
+    after = timeit.timeit(lambda: [history.get_data_by_operation_from_date(o, from_date)
+                                   for o in operations], number=number) / number
+    print_benchmark(f"Pending operations in a history of {len(history.all_data)} rows", before, after)
+
+
+class HistoryDataDefaultLegacy:
+    """
+    History row as it was stored before, with an instance dict and the value as text only
+    """
+    day: float
+    text: str
+    operation: object
+    operation_text: str
+    factory: str
+    warehouse: str
+    value: str
+
+
+def get_allocated_bytes(create_function) -> tuple[object, int]:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    created = create_function()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return created, after - before
+
+
+def benchmark_history_memory(num_of_rows: int = 20000):
+    rows = list(HistoryData.iter_rows_from_web_response(get_synthetic_history_response(num_of_rows)))
+
+    def copy_rows(row_type, with_amount: bool) -> list:
+        copies = []
+        for hd in rows:
+            c = row_type()
+            c.day = hd.day
+            c.text = hd.text
+            c.operation = hd.operation
+            c.operation_text = hd.operation_text
+            c.factory = hd.factory
+            c.warehouse = hd.warehouse
+            c.value = hd.value
+            if with_amount:
+                c.amount = hd.amount
+            copies.append(c)
+        return copies
+
+    # the strings are shared by both copies, so only the size of the records is compared
+    legacy, bytes_before = get_allocated_bytes(lambda: copy_rows(HistoryDataDefaultLegacy, False))
+    slotted, bytes_after = get_allocated_bytes(lambda: copy_rows(HistoryDataDefault, True))
+    for a, b in zip(legacy, slotted):
+        assert (a.day, a.text, a.operation, a.factory, a.warehouse, a.value) == \
+               (b.day, b.text, b.operation, b.factory, b.warehouse, b.value)
+        assert b.amount == float(a.value)
+
+    print(f"Memory per history row: {bytes_before / num_of_rows:.0f} bytes -> {bytes_after / num_of_rows:.0f} bytes "
+          f"({bytes_before / bytes_after:.1f}x)")
+
+
+def get_history_operation_type_legacy(type_string: str) -> HistoryOperationTypes:
+    """
+    Classifier as it was done by values.get_history_operation_type before
+    """
+    if "Shipping" in type_string:
+        return HistoryOperationTypes.SHIPPING
+    elif "Satisfy demand in" in type_string:
+        return HistoryOperationTypes.SERVE_REGION
+    elif "Schedule warehouse" in type_string:
+        return HistoryOperationTypes.SCHEDULE_WAREHOUSE
+    elif "Schedule capacity change" in type_string:
+        return HistoryOperationTypes.SCHEDULE_FACTORY
+    elif "Fulfillment policy" in type_string:
+        return HistoryOperationTypes.FULFILLMENT_POLICY
+    elif "Order point" in type_string:
+        return HistoryOperationTypes.ORDER_POINT
+    elif "Order quantity" in type_string:
+        return HistoryOperationTypes.ORDER_QUANTITY
+    elif "Order priority" in type_string:
+        return HistoryOperationTypes.ORDER_PRIORITY
+    else:
+        return HistoryOperationTypes.UNDEFINED
+
+
+def benchmark_history_operation_types(num_of_rows: int = 50000, number: int = 10):
+    operation_texts = ["Shipping method", "Satisfy demand in Calopeia", "Schedule warehouse capacity change",
+                       "Schedule capacity change", "Fulfillment policy", "Order point", "Order quantity",
+                       "Order priority", "Loan", "Order point and Shipping method"]
+    type_strings = [f"{random.choice(operation_texts)} {random.choice(values.list_of_regions)}"
+                    for i in range(num_of_rows)]
+
+    assert [get_history_operation_type_legacy(t) for t in type_strings] == \
+           [get_history_operation_type(t) for t in type_strings]
+
+    before = timeit.timeit(lambda: [get_history_operation_type_legacy(t) for t in type_strings],
+                           number=number) / number
+    after = timeit.timeit(lambda: [get_history_operation_type(t) for t in type_strings], number=number) / number
+    print_benchmark(f"Classify {num_of_rows} history operations", before, after)
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    benchmark_plot_parser()
+    benchmark_from_day_queries()
+    benchmark_history_parser()
+    benchmark_history_queries()
+    benchmark_history_memory()
+    benchmark_history_operation_types()
@@ -11,3 +11,20 @@ load_backup_folder: str = None
 
 execute_backups: bool = False
 backup_diff_in_minutes: int = 0
+
+max_fetch_workers: int = 8
+print_fetch_timings: bool = True
+incremental_plot_data: bool = True
+
+csv_batch_size: int = 20
+csv_flush_seconds: int = 300
+use_binary_sidecar: bool = True
+
+backup_queue_size: int = 256
+backup_queue_timeout: float = 1.0
+backup_max_pending_bytes: int = 64 * 1024 * 1024
+
+replay_output_directory: str = r"outputs/replay"
+
+# SQLite file for the history of all series, None disables it
+time_series_database_path: str = None
@@ -0,0 +1,178 @@
+import atexit
+import csv
+import io
+import os
+import time
+from typing import Callable
+
+import numpy as np
+
+import config
+
+# bytes of one (day, value) pair in the binary file
+binary_row_size = 16
+
+
+def get_csv_row(row) -> bytes:
+    out = io.StringIO()
+    csv.writer(out).writerow(row)
+    return out.getvalue().encode()
+
+
+def get_binary_path(csv_path: str) -> str:
+    return csv_path + ".f64"
+
+
+class RawCsvWriter:
+    """
+    Appends rows to an open file in batches, flushed when enough rows are buffered or after some time
+    """
+    path: str
+    rows: list[bytes]
+    last_flush: float
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = []
+        self.last_flush = time.monotonic()
+        self.file = None
+
+    def write_row(self, row):
+        if config.disable_logging:
+            return
+        self.rows.append(get_csv_row(row))
+        if len(self.rows) >= config.csv_batch_size \
+                or time.monotonic() - self.last_flush >= config.csv_flush_seconds:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if len(self.rows) <= 0:
+            return
+        if self.file is None:
+            self.file = open(self.path, 'ab')
+        self.file.write(b''.join(self.rows))
+        self.file.flush()
+        self.rows = []
+
+
+class AveragedCsvWriter:
+    """
+    Keeps the file of the datapoints averaged by day open. If only the last day changed or a new day was added,
+    only the last row is written, otherwise the whole file.
+    If config.use_binary_sidecar is set, the same datapoints are kept as float64 pairs in a binary file next to it.
+    """
+    path: str
+    last_day: float
+    last_row_offset: int
+    binary_rows: int
+
+    def __init__(self, path: str):
+        self.path = path
+        self.last_day = None
+        self.last_row_offset = None
+        self.file = None
+        self.binary_rows = None
+        self.binary_file = None
+
+    def write_all(self, datapoints: list):
+        if config.disable_logging:
+            return
+        if self.file is None:
+            self.file = open(self.path, 'wb')
+        self.file.seek(0)
+        self.file.truncate()
+        self.last_day = None
+        self.last_row_offset = None
+        for p in datapoints:
+            self.last_day = p[0]
+            self.last_row_offset = self.file.tell()
+            self.file.write(get_csv_row(p))
+        self.file.flush()
+        self.write_binary_all(datapoints)
+
+    """
+    The binary file is replaced instead of truncated, so readers never see a half written file
+    """
+
+    def write_binary_all(self, datapoints: list):
+        if config.disable_logging or not config.use_binary_sidecar:
+            return
+        if self.binary_file is not None:
+            self.binary_file.close()
+            self.binary_file = None
+
+        binary_path = get_binary_path(self.path)
+        with open(binary_path + ".tmp", 'wb') as f:
+            f.write(np.array(datapoints, dtype=np.float64).reshape(-1, 2).tobytes())
+        os.replace(binary_path + ".tmp", binary_path)
+        self.binary_rows = len(datapoints)
+
+    def write_binary_day(self, point: tuple, new_day: bool):
+        if not config.use_binary_sidecar:
+            return
+        if self.binary_rows is None:
+            raise Exception(f"Binary file of {self.path} not written yet")
+        if self.binary_file is None:
+            self.binary_file = open(get_binary_path(self.path), 'r+b')
+
+        if not new_day:
+            self.binary_rows -= 1
+        self.binary_file.seek(self.binary_rows * binary_row_size)
+        self.binary_file.write(np.array(point, dtype=np.float64).tobytes())
+        self.binary_file.flush()
+        self.binary_rows += 1
+
+    """
+    point is the averaged value of the day that changed, get_datapoints returns all averaged datapoints and is only
+    called if the whole file has to be written
+    """
+
+    def write_day(self, point: tuple, get_datapoints: Callable[[], list]):
+        if config.disable_logging:
+            return
+
+        # unknown file state or a day before the last one changed
+        if self.last_row_offset is None or point[0] < self.last_day:
+            self.write_all(get_datapoints())
+            return
+
+        new_day = point[0] > self.last_day
+        if new_day:
+            self.file.seek(0, os.SEEK_END)
+            self.last_row_offset = self.file.tell()
+        else:
+            self.file.seek(self.last_row_offset)
+            self.file.truncate()
+        self.last_day = point[0]
+        self.file.write(get_csv_row(point))
+        self.file.flush()
+        self.write_binary_day(point, new_day)
+
+
+class CsvLogWriters:
+    """
+    Writers stay open for the whole process (key: path), as TeamData may be created again on every refresh
+    """
+    raw_writers: dict[str, RawCsvWriter] = {}
+    averaged_writers: dict[str, AveragedCsvWriter] = {}
+
+    @staticmethod
+    def get_raw_writer(path: str) -> RawCsvWriter:
+        if path not in CsvLogWriters.raw_writers:
+            CsvLogWriters.raw_writers[path] = RawCsvWriter(path)
+        return CsvLogWriters.raw_writers[path]
+
+    @staticmethod
+    def get_averaged_writer(path: str) -> AveragedCsvWriter:
+        if path not in CsvLogWriters.averaged_writers:
+            CsvLogWriters.averaged_writers[path] = AveragedCsvWriter(path)
+        return CsvLogWriters.averaged_writers[path]
+
+    @staticmethod
+    def flush_all():
+        for w in CsvLogWriters.raw_writers.values():
+            w.flush()
+
+
+atexit.register(CsvLogWriters.flush_all)
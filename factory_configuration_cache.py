@@ -0,0 +1,78 @@
+import hashlib
+import threading
+
+import values
+from factory_data import FactoryData, ShippingMatrix
+from request_helper import fetch_concurrently
+from summary_helper import get_factory_configuration_table
+
+
+class FactoryConfiguration:
+    list_factory_data: list[FactoryData]
+    shipping_matrix: ShippingMatrix
+    table: str
+
+    def __init__(self, list_factory_data: list[FactoryData]):
+        self.list_factory_data = list_factory_data
+        self.shipping_matrix = ShippingMatrix(list_factory_data, len(values.list_of_regions))
+        self.table = get_factory_configuration_table(list_factory_data)
+
+
+def get_factory_url(idx_region: int) -> str:
+    return f"https://op.responsive.net/SupplyChain/SCFactory?action=change&region={idx_region + 1}"
+
+
+class FactoryConfigurationCache:
+    """
+    Fetches and parses the factory pages of all regions concurrently. A page is only parsed again if its content
+    changed, the configuration (and its table) is only built again if any page changed.
+    """
+    parsed: dict[str, tuple[bytes, FactoryData]]
+    configuration_key: tuple
+    configuration: FactoryConfiguration
+    parses: int
+
+    def __init__(self):
+        self.parsed = {}
+        self.configuration_key = None
+        self.configuration = None
+        self.parses = 0
+        self.lock = threading.Lock()
+
+    def parse(self, url: str, name: str, response_text: str) -> bytes:
+        response_hash = hashlib.sha1(response_text.encode()).digest()
+        entry = self.parsed.get(url)
+        if entry is None or entry[0] != response_hash:
+            fd = FactoryData()
+            fd.name = name
+            fd.init_from_web_response(response_text)
+            with self.lock:
+                self.parsed[url] = (response_hash, fd)
+                self.parses += 1
+        return response_hash
+
+    """
+    fetch_function: (url, name, get) -> (status, text), as for fetch_concurrently
+    """
+
+    def get_configuration(self, fetch_function, max_workers: int = None) -> FactoryConfiguration:
+        response_hashes = {}
+
+        def fetch_and_parse(url: str, name: str, get: bool):
+            status, text = fetch_function(url, name, get)
+            if status == 200 and text is not None:
+                response_hashes[url] = self.parse(url, name, text)
+            return status, text
+
+        urls = [get_factory_url(idx) for idx in range(len(values.list_of_regions))]
+        summary = fetch_concurrently(fetch_and_parse, [(urls[idx], values.list_of_regions[idx], True)
+                                                       for idx in range(len(urls))], max_workers)
+        # a region that could not be fetched or parsed is shown as empty, so report why
+        summary.print_failures()
+
+        key = tuple(response_hashes.get(url) for url in urls)
+        if key != self.configuration_key:
+            self.configuration = FactoryConfiguration([self.parsed[url][1] if response_hashes.get(url) is not None
+                                                       else None for url in urls])
+            self.configuration_key = key
+        return self.configuration
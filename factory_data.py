@@ -1,4 +1,5 @@
 class ShippingConfig:
+    __slots__ = ("target", "shipping_method", "order_point", "quantity", "priority")
     target: str
     shipping_method: str
     order_point: int
@@ -10,15 +11,88 @@ class ShippingConfig:
 
 
 class FactoryData:
-    name: str = 1
+    __slots__ = ("name", "capacity", "capacity_modifications", "shipping_configs")
+    name: str
     capacity: int
     capacity_modifications: list
     shipping_configs: list[ShippingConfig]
 
     def __init__(self):
         self.name = ''
-        self.capacity = 0.0
+        self.capacity = 0
         self.capacity_modifications = []
         self.shipping_configs = []
 
+    def init_from_web_response(self, response_text: str):
+        # capacity
+        idx_start: int = response_text.index("current capacity of ") + len("current capacity of ")
+        idx_end: int = response_text.index(".\n")
+        self.capacity = int(float(response_text[idx_start:idx_end]))
 
+        # get configuration block
+        idx_start = response_text.index("priority level", idx_end) + len("priority level")
+        idx_start = response_text.index("<tr><td>", idx_start) + len("<tr><td>")
+        idx_end = response_text.index("</table>", idx_end)
+
+        config_text = response_text[idx_start:idx_end]
+        config_split = config_text.split("<tr><td>")
+
+        for x in config_split:
+
+            conf = ShippingConfig()
+
+            # target
+            sta = 0
+            end = x.index("</td>", sta)
+            conf.target = x[sta:end]
+
+            # shipping method
+            sta = x.index("<select ", end) + len("<select ")
+            if "value=truck selected" in x[sta:]:
+                conf.shipping_method = "Truck"
+            elif "value=mail selected" in x[sta:]:
+                conf.shipping_method = "Mail"
+            else:
+                conf.shipping_method = "NONE SELECTED"
+
+            # order point
+            sta = x.index("</select>", end)
+            sta = x.index("value=", sta) + len("value=")
+            end = x.index(">", sta)
+            conf.order_point = int(float(x[sta:end]))
+
+            # order quantity
+            sta = x.index("quant", end)
+            sta = x.index("value=", sta) + len("value=")
+            end = x.index(">", sta)
+            conf.quantity = int(float(x[sta:end]))
+
+            # priority
+            sta = x.index("priority", end)
+            sta = x.index("value=", sta) + len("value=")
+            end = x.index(">", sta)
+            conf.priority = int(float(x[sta:end]))
+
+            self.shipping_configs.append(conf)
+        return self
+
+
+class ShippingMatrix:
+    """
+    Shipping configuration from the factory of a region (row) to the warehouse of a region (column), both in the order
+    of values.list_of_regions. None where the factory page was missing or has no configuration for the target.
+    """
+    __slots__ = ("configs",)
+    configs: list[list[ShippingConfig]]
+
+    def __init__(self, list_factory_data: list[FactoryData], num_of_regions: int):
+        self.configs = []
+        for fd in list_factory_data:
+            row = [None] * num_of_regions
+            if fd is not None:
+                for idx_target, conf in enumerate(fd.shipping_configs[:num_of_regions]):
+                    row[idx_target] = conf
+            self.configs.append(row)
+
+    def get(self, idx_region: int, idx_target: int) -> ShippingConfig:
+        return self.configs[idx_region][idx_target]
@@ -1,4 +1,5 @@
 class GeneralData:
+    __slots__ = ("cash", "day", "day_precise")
     cash: float
     day: int
     day_precise: float
@@ -7,3 +8,19 @@ class GeneralData:
         self.cash = cash
         self.day = day
         self.day_precise = day
+
+    @staticmethod
+    def from_web_response(response_text: str):
+        # get cash
+        cash_idx_start = response_text.index("Cash: <b>$") + len("Cash: <b>$")
+        cash_idx_end = response_text.index("</b>", cash_idx_start)
+        cash_text = response_text[cash_idx_start:cash_idx_end].replace(",", "")
+        cash_float = float(cash_text)
+
+        # get day
+        day_idx_start = response_text.index("Day: <b>") + len("Day: <b>")
+        day_idx_end = response_text.index("</b>", day_idx_start)
+        day_text = response_text[day_idx_start:day_idx_end].replace(",", "")
+        day_int = int(day_text)
+
+        return GeneralData(cash_float, day_int)
@@ -1,10 +1,18 @@
+import math
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from operator import attrgetter
+from typing import Iterator
+
 import requests
 
 from values import HistoryOperationTypes, get_history_operation_type, OperationValues
-from string_helper import get_index
+from string_helper import get_index, get_number
 
 
 class HistoryDataDefault:
+    __slots__ = ("day", "text", "operation", "operation_text", "factory", "warehouse", "value", "amount")
     day: float
     text: str
     operation: HistoryOperationTypes
@@ -12,90 +20,219 @@ class HistoryDataDefault:
     factory: str
     warehouse: str
     value: str
+    # value as number, None if the value is not numeric
+    amount: float
 
-class HistoryData:
+    def get_key(self) -> tuple:
+        return self.day, self.text, self.operation_text, self.factory, self.warehouse, self.value
 
-    all_data: list[HistoryDataDefault]
-    data_by_operation: dict[HistoryOperationTypes, list[HistoryDataDefault]]
 
-    def __init__(self):
-        self.all_data = []
-        self.data_by_operation = {}
-        pass
+# columns of a row: day, text, operation, factory, warehouse, value. Only applied to the text of one row, so a row
+# with missing cells is skipped instead of being merged with the next row.
+history_row_pattern = re.compile(r"right>(.*?)</td>.*?left>(.*?)</td>.*?left>(.*?)</td>.*?left>(.*?)</td>"
+                                 r".*?left>(.*?)</td>.*?right>(.*?)</td>", re.DOTALL)
 
-    def init_data_by_operation(self):
-        for d in self.all_data:
-            # add key with empty list if missing
-            if d.operation not in self.data_by_operation:
-                self.data_by_operation[d.operation] = []
-            self.data_by_operation[d.operation].append(d)
-        pass
 
-    def init_from_web_response(self, t: str):
-        if t is None:
+class HistoryDayIndex:
+    """
+    Rows sorted by day (rows of the same day in the order they happened) with the days as a parallel list,
+    so the rows from a day on are a bisect and a slice
+    """
+    days: list[float]
+    rows: list[HistoryDataDefault]
+
+    def __init__(self):
+        self.days = []
+        self.rows = []
+
+    def add(self, hd: HistoryDataDefault):
+        # new rows are usually the newest, so this is an append in most cases
+        idx = bisect_right(self.days, hd.day)
+        self.days.insert(idx, hd.day)
+        self.rows.insert(idx, hd)
+
+    def add_all(self, rows: list[HistoryDataDefault]):
+        days = [hd.day for hd in rows]
+        # usual case: the rows are newer than the known ones and sorted
+        if (len(self.days) <= 0 or len(days) <= 0 or days[0] >= self.days[-1]) \
+                and days == sorted(days):
+            self.days.extend(days)
+            self.rows.extend(rows)
             return
+        for hd in rows:
+            self.add(hd)
 
-        start1 = get_index(t, "</thead>")
-        start1 = get_index(t, "<tr>", start1, True)
-        end1 = get_index(t, "</tbody>", start1)
+    """
+    Same as selecting all rows with int(day) >= from_date
+    """
 
-        history_string = t[start1:end1]
-        history_string_list = history_string.split("</tr>")
-        history_string_list.pop(-1)
+    def get_from_date(self, from_date: float = 0) -> list[HistoryDataDefault]:
+        return self.rows[bisect_left(self.days, math.ceil(from_date)):]
 
-        for x in history_string_list:
-            hd = HistoryDataDefault()
 
-            # day
-            s = get_index(x, "right>", 0, True)
-            e = get_index(x, "</td>", s)
-            hd.day = float(x[s:e].replace(',', ''))
+class HistoryData:
 
-            # text
-            s = get_index(x, "left>", e, True)
-            e = get_index(x, "</td>", s)
-            hd.text = x[s:e]
+    all_data: list[HistoryDataDefault]
+    all_by_day: HistoryDayIndex
+    data_by_operation: dict[HistoryOperationTypes, HistoryDayIndex]
+    data_by_factory: dict[str, HistoryDayIndex]
+    data_by_warehouse: dict[str, HistoryDayIndex]
+    # rows of the newest day, as rows of the same day cannot be told apart by the day
+    last_day: float
+    last_day_keys: Counter
+    # table of the last response, if the page only got rows appended only these are scanned
+    last_table_text: str
 
-            # operation
-            s = get_index(x, "left>", e, True)
-            e = get_index(x, "</td>", s)
-            hd.operation_text = x[s:e]
-            hd.operation = get_history_operation_type(hd.operation_text)
+    def __init__(self):
+        self.reset()
+        pass
 
-            # factory
-            s = get_index(x, "left>", e, True)
-            e = get_index(x, "</td>", s)
-            hd.factory = x[s:e]
+    """
+    Removes all rows, the indexes and what is known about the last response
+    """
 
-            # warehouse
-            s = get_index(x, "left>", e, True)
-            e = get_index(x, "</td>", s)
-            hd.warehouse = x[s:e]
+    def reset(self):
+        self.all_data = []
+        self.all_by_day = HistoryDayIndex()
+        self.data_by_operation = {}
+        self.data_by_factory = {}
+        self.data_by_warehouse = {}
+        self.last_day = None
+        self.last_day_keys = Counter()
+        self.last_table_text = None
+
+    def add_to_indexes(self, rows: list[HistoryDataDefault]):
+        self.all_by_day.add_all(rows)
+        for index, get_key in ((self.data_by_operation, attrgetter("operation")),
+                               (self.data_by_factory, attrgetter("factory")),
+                               (self.data_by_warehouse, attrgetter("warehouse"))):
+            rows_by_key: dict[object, list[HistoryDataDefault]] = {}
+            for d in rows:
+                rows_by_key.setdefault(get_key(d), []).append(d)
+            for key, key_rows in rows_by_key.items():
+                # add key with empty index if missing
+                if key not in index:
+                    index[key] = HistoryDayIndex()
+                index[key].add_all(key_rows)
+
+    """
+    Yields the rows of the history table in the order of the page
+    """
+
+    @staticmethod
+    def iter_rows_from_web_response(t: str, start: int = None, end: int = None) -> Iterator[HistoryDataDefault]:
+        if start is None or end is None:
+            start, end = HistoryData.get_table_range(t)
+
+        for row in t[start:end].split("</tr>"):
+            m = history_row_pattern.search(row)
+            if m is None:
+                continue
+            day, text, operation_text, factory, warehouse, value = m.groups()
+            hd = HistoryDataDefault()
+            hd.day = float(day.replace(',', ''))
+            hd.text = text
+            hd.operation_text = operation_text
+            hd.operation = get_history_operation_type(operation_text)
+            hd.factory = factory
+            hd.warehouse = warehouse
+            hd.value = value
+            hd.amount = get_number(hd.value)
+            yield hd
+
+    @staticmethod
+    def get_table_range(t: str) -> tuple[int, int]:
+        start = get_index(t, "</thead>")
+        start = get_index(t, "<tr>", start)
+        end = get_index(t, "</tbody>", start)
+        return start, end
 
-            # value
-            s = get_index(x, "right>", e, True)
-            e = get_index(x, "</td>", s)
-            hd.value = x[s:e]
+    def init_from_web_response(self, t: str):
+        if t is None:
+            return
 
-            self.all_data.append(hd)
+        self.reset()
+        self.update_from_web_response(t)
 
-        self.init_data_by_operation()
+    """
+    Adds only the rows not known yet: rows of a day before the newest known day are skipped, rows of the newest known
+    day are matched against the rows seen on that day. If the page is sorted descending by day, the scan stops at the
+    first row older than the newest known day. Returns the number of added rows.
+    """
+
+    def update_from_web_response(self, t: str) -> int:
+        if t is None:
+            return 0
+
+        start, end = self.get_table_range(t)
+        table_text = t[start:end]
+        appended = False
+        if self.last_table_text is not None:
+            if table_text == self.last_table_text:
+                return 0
+            # all rows after the known table are new
+            appended = table_text.startswith(self.last_table_text)
+            if appended:
+                start += len(self.last_table_text)
+        self.last_table_text = table_text
+
+        new_rows = []
+        seen_keys = Counter(self.last_day_keys) if not appended else Counter()
+        descending = False
+        previous_day = None
+        for hd in self.iter_rows_from_web_response(t, start, end):
+            if previous_day is not None and hd.day < previous_day:
+                descending = True
+            previous_day = hd.day
+
+            if appended:
+                new_rows.append(hd)
+                continue
+            if self.last_day is not None and hd.day < self.last_day:
+                if descending:
+                    break
+                continue
+            if self.last_day is not None and hd.day == self.last_day:
+                key = hd.get_key()
+                if seen_keys[key] > 0:
+                    seen_keys[key] -= 1
+                    continue
+            new_rows.append(hd)
+
+        if len(new_rows) <= 0:
+            return 0
+
+        # keep the order of the page
+        if descending:
+            self.all_data[:0] = new_rows
+        else:
+            self.all_data.extend(new_rows)
+        self.add_to_indexes(new_rows[::-1] if descending else new_rows)
+
+        new_last_day = max(hd.day for hd in new_rows)
+        if self.last_day is None or new_last_day > self.last_day:
+            self.last_day = new_last_day
+            self.last_day_keys = Counter()
+        self.last_day_keys.update(hd.get_key() for hd in new_rows if hd.day == self.last_day)
+        return len(new_rows)
 
     def get_data_from_date(self, from_date = 0):
-        ret = []
-        for x in self.all_data:
-            if int(x.day) >= from_date:
-                ret.append(x)
-        return ret
+        return self.all_by_day.get_from_date(from_date)
 
     def get_data_by_operation_from_date(self, o: HistoryOperationTypes, from_date: float = 0):
-        ret = []
-        if o in self.data_by_operation:
-            lst = self.data_by_operation[o]
-            for x in lst:
-                if int(x.day) >= from_date:
-                    ret.append(x)
-        return ret
+        if o not in self.data_by_operation:
+            return []
+        return self.data_by_operation[o].get_from_date(from_date)
+
+    def get_data_by_factory_from_date(self, factory: str, from_date: float = 0):
+        if factory not in self.data_by_factory:
+            return []
+        return self.data_by_factory[factory].get_from_date(from_date)
+
+    def get_data_by_warehouse_from_date(self, warehouse: str, from_date: float = 0):
+        if warehouse not in self.data_by_warehouse:
+            return []
+        return self.data_by_warehouse[warehouse].get_from_date(from_date)
 
     # Note: day is not adjusted, so it's still the day of starting, not of completion!
     def get_pending_factory_modification(self, current_day: float):
@@ -106,7 +243,3 @@ class HistoryData:
     def get_pending_warehouse_modification(self, current_day: float):
         return self.get_data_by_operation_from_date(HistoryOperationTypes.SCHEDULE_WAREHOUSE,
                                                     current_day - OperationValues.warehouse_investment_days)
-
-
-
-
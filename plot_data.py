@@ -1,148 +1,239 @@
+import numpy as np
+
 import config
 import plot_data
 from aggregate_type import AggregateType
+from smoothing_type import SmoothingType
 from values import Category
 
 
 class PlotData:
+    """
+    Points are stored in two float64 columns x and y, sorted by x.
+    Start indices of from-day windows are memoized until x changes, smoothed series until x or y changes.
+    """
     category: Category
     name: str
-    points: list[tuple]
+    x: np.ndarray
+    y: np.ndarray
+    from_day_indices: dict[int, int]
+    smoothed: dict[tuple, tuple[np.ndarray, np.ndarray]]
     color: str = "blue"
 
     def __init__(self, name, category, points, capitalize: bool = True):
         self.name = name
         self.category = category
-        self.points = points
         self.color = self.get_default_color(name)
+        if len(points) > 0:
+            columns = np.asarray(points, dtype=np.float64)
+            self.set_columns(columns[:, 0], columns[:, 1])
+        else:
+            self.set_columns(np.empty(0), np.empty(0))
 
         if capitalize:
             self.name = self.name.capitalize()
 
+    @staticmethod
+    def from_columns(name, category, x, y, capitalize: bool = True):
+        pd = PlotData(name, category, [], capitalize)
+        pd.set_columns(x, y)
+        return pd
+
+    def set_columns(self, x, y):
+        x = np.ascontiguousarray(x, dtype=np.float64)
+        y = np.ascontiguousarray(y, dtype=np.float64)
+        if len(x) > 1 and np.any(x[1:] < x[:-1]):
+            order = np.argsort(x, kind="stable")
+            x = x[order]
+            y = y[order]
+        self.x = x
+        self.y = y
+        self.from_day_indices = {}
+        self.smoothed = {}
+
+    def append_points(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if len(x) <= 0:
+            return
+
+        # usual case: new points are appended behind the existing ones
+        if len(self.x) <= 0 or (x[0] >= self.x[-1] and np.all(x[1:] >= x[:-1])):
+            self.set_columns(np.concatenate((self.x, x)), np.concatenate((self.y, y)))
+            return
+
+        # otherwise insert them at their sorted positions, behind existing points with the same x
+        order = np.argsort(x, kind="stable")
+        x = x[order]
+        y = y[order]
+        positions = np.searchsorted(self.x, x, side="right")
+        self.set_columns(np.insert(self.x, positions, x), np.insert(self.y, positions, y))
+
+    """
+    Points as (n, 2) array, built on every call
+    """
+
+    @property
+    def points(self):
+        return np.column_stack((self.x, self.y))
+
     def get_x(self):
-        ret = []
-        for i in range(len(self.points)):
-            ret.append(self.points[i][0])
-        return ret
+        return self.x
+
+    def get_from_day_index(self, from_day: int) -> int:
+        idx = self.from_day_indices.get(from_day)
+        if idx is None:
+            # binary search for the first point with x >= from_day
+            idx = int(np.searchsorted(self.x, from_day, side="left"))
+            self.from_day_indices[from_day] = idx
+        return idx
 
     def get_from_day_points(self, from_day: int):
-        i = 0
-        points = sorted(self.points, key=lambda l: l[0])
-        for i in reversed(range(len(points))):
-            if points[i][0] < from_day:
-                i += 1
-                break
-        return points[i:]
+        idx = self.get_from_day_index(from_day)
+        return np.column_stack((self.x[idx:], self.y[idx:]))
 
     def get_from_day_aggregated_by_day(self,
                                        from_day: int,
                                        aggregate_type: AggregateType,
                                        fill_up_missing_days_between: bool = False
                                        ):
-        points = self.get_from_day_points(from_day)
-        x = []
-        y = []
-        idx = 0
+        idx = self.get_from_day_index(from_day)
+        points_x = self.x[idx:]
+        points_y = self.y[idx:]
+
+        if len(points_x) <= 0:
+            return np.arange(from_day, from_day + config.lastXDays + 1), np.zeros(config.lastXDays + 1)
+
+        # points are sorted, so the points of one (rounded) day are next to each other
+        days = np.round(points_x)
+        starts = np.flatnonzero(np.concatenate(([True], days[1:] != days[:-1])))
+        ends = np.append(starts[1:], len(days))
+        x = days[starts]
+
+        # get max value of day
+        if aggregate_type == AggregateType.MAX:
+            y = np.maximum.reduceat(points_y, starts)
 
-        if len(points) <= 0:
-            x = range(from_day, from_day + config.lastXDays + 1)
-            y = [0] * (config.lastXDays + 1)
+        # get min value of day
+        elif aggregate_type == AggregateType.MIN:
+            y = np.minimum.reduceat(points_y, starts)
 
+        # get last value of day
+        elif aggregate_type == AggregateType.LAST:
+            y = points_y[ends - 1]
+
+        elif aggregate_type == AggregateType.SUM:
+            y = np.add.reduceat(points_y, starts)
+
+        # default: average
         else:
-            while idx < len(points):
-                day = round(points[idx][0])
-                val = points[idx][1]
-                idx += 1
-
-                # fill up missing days
-                if fill_up_missing_days_between:
-                    last_day = from_day if len(x) < 1 else x[-1] + 1
-                    last_value = 0 if len(x) <= 0 else y[-1]
-                    while day > last_day:
-                        x.append(last_day)
-                        y.append(last_value)
-                        last_day += 1
-
-                # get max value of day
-                if aggregate_type == AggregateType.MAX:
-                    while (idx < len(points)) and (day == round(points[idx][0])):
-                        if points[idx][1] > val:
-                            val = points[idx][1]
-                        idx += 1
-
-                # get min value of day
-                elif aggregate_type == AggregateType.MIN:
-                    while (idx < len(points)) and (day == round(points[idx][0])):
-                        if points[idx][1] < val:
-                            val = points[idx][1]
-                        idx += 1
-
-                # get last value of day
-                elif aggregate_type == AggregateType.LAST:
-                    while (idx < len(points)) and (day == round(points[idx][0])):
-                        val = points[idx][1]
-                        idx += 1
-
-                # default: average
-                else:
-                    counter: int = 1
-                    while (idx < len(points)) and (day == round(points[idx][0])):
-                        val += points[idx][1]
-                        counter += 1
-                        idx += 1
-                    val = val / counter
+            y = np.add.reduceat(points_y, starts) / (ends - starts)
 
-                x.append(day)
-                y.append(val)
+        # fill up missing days with the value of the day before (0 before the first day)
+        if fill_up_missing_days_between:
+            filled_x = np.arange(from_day, x[-1] + 1, dtype=np.float64)
+            known = np.full(len(filled_x), -1)
+            known[(x - from_day).astype(int)] = np.arange(len(x))
+            known = np.maximum.accumulate(known)
+            y = np.where(known >= 0, y[known], 0.0)
+            x = filled_x
 
         return x, y
 
-    def get_from_day_smoothed(self, from_day: int, num_of_smoothing_days: int, aggregate_type: AggregateType):
-        points = self.get_from_day_aggregated_by_day(max(from_day - num_of_smoothing_days, 0), aggregate_type)
-        x = []
-        y = []
-
-        for i in range(len(points[0])):
-            idx_start = max(0, i - round((num_of_smoothing_days - 1) / 2))
-            idx_end = min(len(points[0]) - 1, i + round((num_of_smoothing_days - 1) / 2))
-            point_sum = sum(x for x in points[1][idx_start:idx_end])
-            point_len = idx_end - idx_start
-            val = point_sum / point_len
-            if points[0][i] >= from_day:
-                x.append(points[0][i])
-                y.append(val)
+    """
+    Smooths the values aggregated by day. Centered windows reach half the smoothing days into both directions,
+    trailing windows only cover the smoothing days up to the day itself.
+    SIMPLE: average, WEIGHTED: linearly decreasing weights, EXPONENTIAL: exponential moving average
+    (centered: average of a forward and a backward pass)
+    """
 
-        return x, y
+    def get_from_day_smoothed(self, from_day: int, num_of_smoothing_days: int, aggregate_type: AggregateType,
+                              smoothing_type: SmoothingType = SmoothingType.SIMPLE, centered: bool = True):
+        key = (from_day, num_of_smoothing_days, aggregate_type, smoothing_type, centered)
+        if key not in self.smoothed:
+            x, y = self.get_from_day_aggregated_by_day(max(from_day - num_of_smoothing_days, 0), aggregate_type)
+
+            if smoothing_type == SmoothingType.EXPONENTIAL:
+                smoothed_y = self.smooth_exponential(y, num_of_smoothing_days, centered)
+            elif smoothing_type == SmoothingType.WEIGHTED:
+                smoothed_y = self.smooth_weighted(y, num_of_smoothing_days, centered)
+            else:
+                smoothed_y = self.smooth_simple(y, num_of_smoothing_days, centered)
+
+            in_range = x >= from_day
+            self.smoothed[key] = (x[in_range], smoothed_y[in_range])
+        return self.smoothed[key]
+
+    @staticmethod
+    def smooth_simple(y: np.ndarray, num_of_smoothing_days: int, centered: bool) -> np.ndarray:
+        idx = np.arange(len(y))
+        if centered:
+            half = round((num_of_smoothing_days - 1) / 2)
+            idx_start = np.maximum(0, idx - half)
+            idx_end = np.minimum(len(y) - 1, idx + half)
+        else:
+            idx_start = np.maximum(0, idx - num_of_smoothing_days + 1)
+            idx_end = idx + 1
+
+        # window sums from prefix sums, end index is exclusive
+        prefix_sums = np.concatenate(([0.0], np.cumsum(y)))
+        point_len = idx_end - idx_start
+        point_sum = prefix_sums[idx_end] - prefix_sums[idx_start]
+        return np.divide(point_sum, point_len, out=y.astype(np.float64), where=point_len > 0)
+
+    @staticmethod
+    def smooth_weighted(y: np.ndarray, num_of_smoothing_days: int, centered: bool) -> np.ndarray:
+        if len(y) <= 0:
+            return np.empty(0)
+        if centered:
+            half = round((num_of_smoothing_days - 1) / 2)
+            weights = (half + 1 - np.abs(np.arange(-half, half + 1))).astype(np.float64)
+            # full convolution, mode="same" returns len(weights) values for series shorter than the window
+            weighted_sum = np.convolve(y, weights)[half:half + len(y)]
+            weight_sum = np.convolve(np.ones(len(y)), weights)[half:half + len(y)]
+        else:
+            weights = np.arange(num_of_smoothing_days, 0, -1, dtype=np.float64)
+            weighted_sum = np.convolve(y, weights)[:len(y)]
+            weight_sum = np.convolve(np.ones(len(y)), weights)[:len(y)]
+        return weighted_sum / weight_sum
+
+    @staticmethod
+    def smooth_exponential(y: np.ndarray, num_of_smoothing_days: int, centered: bool) -> np.ndarray:
+        alpha = 2 / (num_of_smoothing_days + 1)
+
+        def moving_average(values: np.ndarray) -> np.ndarray:
+            ret = np.empty(len(values))
+            last = values[0] if len(values) > 0 else 0.0
+            for i in range(len(values)):
+                last = alpha * values[i] + (1 - alpha) * last
+                ret[i] = last
+            return ret
+
+        if centered:
+            return (moving_average(y) + moving_average(y[::-1])[::-1]) / 2
+        return moving_average(y)
 
     def get_from_day_x(self, from_day: int):
-        points = self.get_from_day_points(from_day)
-        ret = []
-        for x in points:
-            ret.append(x[0])
-        return ret
+        return self.x[self.get_from_day_index(from_day):]
 
     def get_from_day_y(self, from_day: int):
-        points = self.get_from_day_points(from_day)
-        ret = []
-        for x in points:
-            ret.append(x[1])
-        return ret
+        return self.y[self.get_from_day_index(from_day):]
 
     def get_y(self):
-        ret = []
-        if len(self.points) <= 0:
-            return ret
-        for i in range(len(self.points)):
-            ret.append(self.points[i][1])
-        return ret
+        return self.y
+
+    def copy(self):
+        pd = PlotData.from_columns(self.name, self.category, self.x.copy(), self.y.copy(), False)
+        pd.color = self.color
+        return pd
 
     def multiply_all_y(self, mult: int = 1000):
-        for i in range(len(self.points)):
-            self.points[i][1] *= mult
+        self.y *= mult
+        self.smoothed = {}
         return self
 
     def __str__(self):
-        return self.category.name + ": " + self.name + " (" + str(len(self.points)) + " values)"
+        return self.category.name + ": " + self.name + " (" + str(len(self.x)) + " values)"
 
     @staticmethod
     def get_default_color(name: str):
@@ -171,7 +262,6 @@ class PlotData:
         aggregated_y = []
 
         y_values: list = []
-        points = []
         if len(data) > 0:
             # x
             if x_is_matching:
@@ -194,62 +284,85 @@ class PlotData:
             if len(aggregated_x) != len(aggregated_y):
                 return PlotData(new_name, "AGGREGATE", [], False)
 
-            for i in range(len(aggregated_x)):
-                points.append((aggregated_x[i], aggregated_y[i]))
-
-        return PlotData(new_name, "AGGREGATE", points, False)
+        return PlotData.from_columns(new_name, "AGGREGATE", aggregated_x, aggregated_y, False)
 
     """
     Needed formats:
-    data_lists: [[int, int], [int, int], [int, int]]; every sub-list has to have the same length
+    data_lists: [[int, int], [int, int], [int, int]]; the length of the first list defines the number of values,
+    values missing in shorter lists are ignored
     """
 
     @staticmethod
     def aggregate_lists_by_index(data_list: list, aggtype: AggregateType = AggregateType.AVG):
-        ret_values = []
-        for day_idx in range(len(data_list[0])):
-            val_y: float = 0.0
-
-            if aggtype == AggregateType.MAX:
-                for list_idx in range(len(data_list)):
-                    if len(data_list[list_idx]) > day_idx:
-                        if data_list[list_idx][day_idx] > val_y:
-                            val_y = data_list[list_idx][day_idx]
-                ret_values.append(val_y)
-
-            elif aggtype == AggregateType.MIN:
-                val_y = float("inf")
-                for list_idx in range(len(data_list)):
-                    if len(data_list[list_idx]) > day_idx:
-                        if data_list[list_idx][day_idx] < val_y:
-                            val_y = data_list[list_idx][day_idx]
-                ret_values.append(val_y)
-
-            elif aggtype == AggregateType.SUM:
-                for list_idx in range(len(data_list)):
-                    if len(data_list[list_idx]) > day_idx:
-                        val_y += data_list[list_idx][day_idx]
-                ret_values.append(val_y)
+        # one row per list, missing values are NaN
+        num_of_values = len(data_list[0])
+        matrix = np.full((len(data_list), num_of_values), np.nan)
+        for list_idx in range(len(data_list)):
+            values = np.asarray(data_list[list_idx], dtype=np.float64)[:num_of_values]
+            matrix[list_idx, :len(values)] = values
+        present = ~np.isnan(matrix)
 
-            else:
-                counter = 0
-                for list_idx in range(len(data_list)):
-                    if len(data_list[list_idx]) > day_idx:
-                        counter += 1
-                        val_y += data_list[list_idx][day_idx]
-                ret_values.append(0 if counter == 0 else val_y / counter)
+        if aggtype == AggregateType.MAX:
+            # starts at 0.0 like a running maximum would
+            return np.max(np.where(present, matrix, 0.0), axis=0, initial=0.0)
+
+        elif aggtype == AggregateType.MIN:
+            return np.min(np.where(present, matrix, np.inf), axis=0, initial=np.inf)
 
-        return ret_values
+        elif aggtype == AggregateType.SUM:
+            return np.nansum(matrix, axis=0)
+
+        else:
+            counter = np.sum(present, axis=0)
+            val_y = np.nansum(matrix, axis=0)
+            return np.divide(val_y, counter, out=np.zeros(num_of_values), where=counter > 0)
 
     @staticmethod
     def cumulate_plot_data(new_name: str, pd, from_day: int):
-        points = []
-        x_vals, y_vals = pd.get_from_day_aggregated_by_day(0, AggregateType.AVG, True)
-        if (len(x_vals) == len(y_vals)) and (len(x_vals) > 0):
-            points.append((x_vals[0], y_vals[0]))
-            last_y = y_vals[0]
-            for i in range(1, len(x_vals)):
-                points.append((x_vals[i], last_y + y_vals[i]))
-                last_y = last_y + y_vals[i]
-
-        return PlotData(new_name, "CUMULATED", points[from_day:], False)
+        return CumulativePlotData().update(pd).get_from_day(new_name, from_day, False)
+
+
+class CumulativePlotData:
+    """
+    Running total of a series aggregated by day (average per day, missing days filled with the day before).
+    On update only the days from the last known day on are aggregated again, as the last day may have been incomplete.
+    """
+    x: np.ndarray
+    y: np.ndarray
+
+    def __init__(self):
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+
+    def get_update_from_day(self) -> int:
+        return int(self.x[-1]) if len(self.x) > 0 else 0
+
+    def update(self, pd: PlotData):
+        from_day = self.get_update_from_day()
+        if len(self.x) > 0 and len(pd.get_from_day_x(from_day)) <= 0:
+            return self
+
+        if len(self.x) > 0:
+            # points are rounded to days, so the last known day also contains points of the day before
+            x_vals, y_vals = pd.get_from_day_aggregated_by_day(from_day - 1, AggregateType.AVG, True)
+            x_vals, y_vals = x_vals[x_vals >= from_day], y_vals[x_vals >= from_day]
+        else:
+            x_vals, y_vals = pd.get_from_day_aggregated_by_day(from_day, AggregateType.AVG, True)
+        keep = max(len(self.x) - 1, 0)
+        last_y = self.y[keep - 1] if keep > 0 else 0.0
+
+        self.x = np.concatenate((self.x[:keep], x_vals))
+        self.y = np.concatenate((self.y[:keep], last_y + np.cumsum(y_vals)))
+        return self
+
+    """
+    Cut by day value. If from_day_as_zero is set, the values are cumulated from from_day on instead of the first day.
+    """
+
+    def get_from_day(self, new_name: str, from_day: int, from_day_as_zero: bool = True) -> PlotData:
+        idx = int(np.searchsorted(self.x, from_day, side="left"))
+        y = self.y[idx:]
+        if from_day_as_zero and idx > 0:
+            y = y - self.y[idx - 1]
+        # copies, the returned data may be modified (e.g. multiply_all_y) but the running total must not
+        return PlotData.from_columns(new_name, "CUMULATED", self.x[idx:].copy(), y.copy(), False)
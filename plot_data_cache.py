@@ -0,0 +1,92 @@
+import hashlib
+
+from plot_data import PlotData
+from plot_parser import get_plot_lines, parse_point_columns
+from string_helper import print_line
+from values import Category
+
+
+class PlotDataCacheEntry:
+    response_hash: bytes
+    lines: list[tuple[str, str]]
+    data_list: list[PlotData]
+
+    def __init__(self, response_hash: bytes, lines: list[tuple[str, str]], data_list: list[PlotData]):
+        self.response_hash = response_hash
+        self.lines = lines
+        self.data_list = data_list
+
+
+class PlotDataCache:
+    """
+    Keeps the last parsed plot data per url. Unchanged responses are not parsed again, for changed responses only the
+    points appended since the last response are parsed and merged.
+    """
+    entries: dict[str, PlotDataCacheEntry]
+    full_parses: int
+    incremental_parses: int
+    unchanged: int
+
+    def __init__(self):
+        self.entries = {}
+        self.reset_statistics()
+
+    def reset_statistics(self):
+        self.full_parses = 0
+        self.incremental_parses = 0
+        self.unchanged = 0
+
+    def get_plot_data(self, url: str, response_text: str, name: str, category: Category) -> list[PlotData]:
+        response_hash = hashlib.sha1(response_text.encode()).digest()
+        entry = self.entries.get(url)
+
+        if entry is not None and entry.response_hash == response_hash:
+            self.unchanged += 1
+        else:
+            lines = get_plot_lines(response_text, name)
+            entry = PlotDataCacheEntry(response_hash, lines, self.merge(entry, lines, category))
+            self.entries[url] = entry
+
+        # callers modify the returned data (e.g. multiply_all_y), so the cached data must not be handed out
+        return [d.copy() for d in entry.data_list]
+
+    def merge(self, entry: PlotDataCacheEntry, lines: list[tuple[str, str]], category: Category) -> list[PlotData]:
+        if entry is not None and [l[0] for l in entry.lines] == [l[0] for l in lines]:
+            data_list = []
+            for idx in range(len(lines)):
+                data = self.merge_line(entry.data_list[idx], entry.lines[idx][1], lines[idx][1])
+                if data is None:
+                    break
+                data_list.append(data)
+            else:
+                self.incremental_parses += 1
+                return data_list
+
+        self.full_parses += 1
+        return [PlotData.from_columns(data_name, category, *parse_point_columns(point_text))
+                for data_name, point_text in lines]
+
+    """
+    Returns None if the new points text does not continue the old one, so it has to be parsed completely
+    """
+
+    @staticmethod
+    def merge_line(data: PlotData, old_point_text: str, point_text: str):
+        if not point_text.startswith(old_point_text):
+            return None
+
+        appended_text = point_text[len(old_point_text):]
+        if appended_text == '':
+            return data
+        # the last number of the old text must not have been continued
+        if old_point_text != '' and not appended_text.startswith(' '):
+            return None
+
+        # all appended points are new, step series repeat the x of the last point
+        x, y = parse_point_columns(appended_text.strip())
+        data.append_points(x, y)
+        return data
+
+    def print_statistics(self):
+        print_line(f"Plot data: {self.unchanged} unchanged, {self.incremental_parses} merged, "
+                   f"{self.full_parses} parsed completely")
@@ -0,0 +1,39 @@
+import numpy as np
+
+# SCPlotk responses contain the plotted lines in form of
+# lines:[{label: 'name', points:'x1 y1 x2 y2 ...'}, ...],
+
+
+def get_plot_lines(response_text: str, name: str) -> list[tuple[str, str]]:
+    """
+    Returns (name, points text) for every line of the response, empty list if no plottable data is available
+    """
+    if response_text.find("no plot:") > 0:
+        return []
+    idx_start = response_text.index("lines:[")
+    idx_end = response_text.index("],", idx_start)
+    sub = response_text[idx_start:idx_end]
+    elements: [str] = sub.split("{label: '")
+    elements.pop(0)
+
+    lines = []
+    for e in elements:
+        # get name
+        data_name = e[0:e.index("'")].strip()
+        if data_name == '':
+            data_name = name
+
+        # get data
+        point_text = e[e.index("points:'") + len("points:'"):e.index("'},")]
+        lines.append((data_name, point_text))
+    return lines
+
+
+def parse_point_columns(point_text: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parses the points text in a single pass into one column of x and one column of y values
+    """
+    values = np.fromstring(point_text, dtype=np.float64, sep=' ')
+    # an incomplete last point is ignored
+    values = values[:len(values) - len(values) % 2]
+    return values[0::2].copy(), values[1::2].copy()
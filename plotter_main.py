@@ -1,29 +1,39 @@
 #!/usr/bin/env python3
-import os
+import atexit
 import pathlib
 
 import requests
 import argparse
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpl_patches
+import numpy as np
 import time
 from datetime import datetime, timedelta
 
 from matplotlib.axes import Axes
-from texttable import Texttable
 
 import config
 import factory_data
 import plot_data
 import values
 from aggregate_type import AggregateType
-from history_data import HistoryData, HistoryDataDefault
+from backup_store import BackupStore, BackupWriter
+from history_data import HistoryData
 from team_standing_data import TeamStandingData
+from time_series_store import TimeSeriesStore
 
-from plot_data import PlotData
+from plot_data import PlotData, CumulativePlotData
+from plot_data_cache import PlotDataCache
+from plot_parser import get_plot_lines, parse_point_columns
+from refresh_aggregates import RefreshAggregates
 from values import Category
 from general_data import GeneralData
-from factory_data import FactoryData, ShippingConfig
+from factory_data import FactoryData
+from factory_configuration_cache import FactoryConfiguration, FactoryConfigurationCache
+from request_helper import RequestCache, create_session, download_response, fetch_concurrently
+from string_helper import print_line
+from summary_helper import SummaryWriter, get_warehouse_summary, get_factory_summary, \
+    get_pending_orders_summary, get_pending_transport_summary
 
 # Parse arguments
 arg_parser = argparse.ArgumentParser("Plotter for Supply Chain Game Data")
@@ -74,11 +84,6 @@ if args.load_backup:
     config.load_from_backup = True
 
 
-def print_line(line: str):
-    ts = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
-    print(f"[{ts}]\t{line}")
-
-
 def login(session: requests.Session):
     # Do not attempt logging in when started from backups
     if config.load_from_backup:
@@ -106,62 +111,73 @@ def login(session: requests.Session):
     return
 
 
-s = requests.Session()
+s = create_session()
 login(s)
 
+# responses of the current refresh, cleared at the start of each loop
+response_cache = RequestCache()
 
-def get_escaped_url_for_filesave(url: str) -> str:
-    return url.replace(':', '_').replace('/', '_').replace('?', '_') + ".html"
+# parsed plot data of the last refresh (key: url)
+plot_data_cache = PlotDataCache()
 
+# website backups
+backup_store = BackupStore(values.FilePaths.website_backup_directory)
+if config.load_from_backup:
+    backup_store.get_index()
+backup_writer = BackupWriter(backup_store)
+atexit.register(backup_writer.close)
 
-def backup_request_response(r: requests.Response):
-    file_name = get_escaped_url_for_filesave(r.url)
-    root_path = values.FilePaths.website_backup_directory
+# parsed factory pages and configuration table of the last refresh
+factory_configuration_cache = FactoryConfigurationCache()
+
+# summaries in the output files, only written again if their inputs changed
+summary_writer = SummaryWriter()
+
+# rows of the history page, only new rows are parsed on each refresh
+history_data = HistoryData()
+
+# history of all plot series and standings, committed once per refresh. Not used when loading from a backup, so
+# replayed values do not end up in the live history.
+time_series_store = TimeSeriesStore(config.time_series_database_path) \
+    if config.time_series_database_path is not None and not config.load_from_backup else None
+if time_series_store is not None:
+    atexit.register(time_series_store.close)
 
-    backup_dir_name = loop_start_time.strftime('%Y-%m-%d_%H-%M-%S')
-    directory_path = os.path.join(root_path, backup_dir_name)
 
-    if not os.path.exists(directory_path):
-        os.makedirs(directory_path)
+def get_backup_snapshot_name() -> str:
+    return loop_start_time.strftime('%Y-%m-%d_%H-%M-%S')
 
-    file_path = os.path.join(directory_path, file_name)
 
-    with open(file_path, 'w') as f:
-        f.write(r.text)
+def is_backup_cycle() -> bool:
+    return config.execute_backup_only or \
+        (config.execute_backups and values.latest_backup_time + timedelta(minutes=
+            config.backup_diff_in_minutes) < loop_start_time)
+
+
+def finish_backup_cycle():
+    if is_backup_cycle() and not config.load_from_backup:
+        backup_writer.finish_snapshot(get_backup_snapshot_name())
+
+    if config.execute_backups \
+            and values.latest_backup_time + timedelta(minutes=config.backup_diff_in_minutes) < loop_start_time:
+        print_line(f"Backup executed!")
+        values.latest_backup_time = datetime.now()
+
+
+def backup_request_response(r: requests.Response):
+    backup_writer.add_response(get_backup_snapshot_name(), r.url, r.text)
 
 
 # if no backup folder specified, the newest backup will be used
 def get_response_from_backup(url: str, backup_folder: str = None):
-    file_name = get_escaped_url_for_filesave(url)
-    root_path = values.FilePaths.website_backup_directory
-
-    # try get from specific folder
-    if backup_folder is not None:
-        directory_path = os.path.join(root_path, backup_folder)
-        if not os.path.exists(directory_path):
-            raise Exception(f"Directory {directory_path} not found!")
-        file_path = os.path.join(directory_path, file_name)
-        if not os.path.exists(file_path):
-            raise Exception(f"File {file_path} not found!")
-
-        with open(file_path, "r") as f:
-            out = f.read()
-        return out
-
-    # search all backups in reversed order to find the newest backup
-    else:
-        subfolders = [f.path for f in os.scandir(root_path) if f.is_dir()]
-        subfolders.sort(reverse=True)
-        for s in subfolders:
-            file_path = os.path.join(s, file_name)
-            if os.path.exists(file_path):
-                with open(file_path, "r") as f:
-                    out = f.read()
-                return out
-    return None
+    return backup_store.get_response(url, backup_folder)
 
 
 def execute_request(s: requests.Session, url: str, name: str, get: bool = True):
+    return response_cache.get_or_fetch(url, get, lambda: execute_request_uncached(s, url, name, get))
+
+
+def execute_request_uncached(s: requests.Session, url: str, name: str, get: bool = True):
     response_status: int
     response_text: str
 
@@ -169,32 +185,26 @@ def execute_request(s: requests.Session, url: str, name: str, get: bool = True):
         response_status = 200
         response_text = get_response_from_backup(url, config.load_backup_folder)
     else:
-        retry_ctr = 0
-        response = None
-        while retry_ctr < config.max_retries:
-            try:
-                if get:
-                    response = s.get(url, timeout=10)
-                else:
-                    response = s.post(url, timeout=5)
-                break
-            except:
-                retry_ctr += 1
-                print_line(
-                    f"[{name}]\tDownload not possible, try again in {config.delay_retry} seconds ({config.max_retries - retry_ctr} attempts left)")
-                time.sleep(config.delay_retry)
+        response = download_response(s, url, name, get)
 
         response_status = response.status_code
         response_text = response.text
 
-        if config.execute_backup_only or \
-                (config.execute_backups and values.latest_backup_time + timedelta(minutes=
-                    config.backup_diff_in_minutes) < loop_start_time):
+        if is_backup_cycle():
             backup_request_response(response)
 
     return response_status, response_text
 
 
+def prefetch_responses(session: requests.Session):
+    summary = fetch_concurrently(lambda url, name, get: execute_request(session, url, name, get),
+                                 values.get_refresh_requests())
+    if config.print_fetch_timings:
+        summary.print_timings()
+    # failed requests are not cached, they are requested again when the data is read
+    summary.print_failures()
+
+
 # easiest point where the exact date can be seen is in factory WIP
 # def get_precise_day(s: requests.Session) -> float:
 #     get_plot_data(s,
@@ -210,56 +220,23 @@ def execute_request(s: requests.Session, url: str, name: str, get: bool = True):
 
 def get_general_data(session: requests.Session, url: str):
     response_status, response_text = execute_request(session, url, "GeneralData")
-
-    # get cash
-    cash_idx_start = response_text.index("Cash: <b>$") + len("Cash: <b>$")
-    cash_idx_end = response_text.index("</b>", cash_idx_start)
-    cash_text = response_text[cash_idx_start:cash_idx_end].replace(",", "")
-    cash_float = float(cash_text)
-
-    # get day
-    day_idx_start = response_text.index("Day: <b>") + len("Day: <b>")
-    day_idx_end = response_text.index("</b>", day_idx_start)
-    day_text = response_text[day_idx_start:day_idx_end].replace(",", "")
-    day_int = int(day_text)
-
-    return GeneralData(cash_float, day_int)
+    return GeneralData.from_web_response(response_text)
 
 
 def get_plot_data(session: requests.Session, url: str, name: str, category: Category):
     # get data as text
     response_status, response_text = execute_request(session, url, name)
 
-    # check if plottable data is available
-    if response_text.find("no plot:") > 0:
-        # print(f"{name}: no plottable data found")
-        return []
-    idx_start = response_text.index("lines:[")
-    idx_end = response_text.index("],", idx_start)
-    sub = response_text[idx_start:idx_end]
-    elements: [str] = sub.split("{label: '")
-    elements.pop(0)
-
-    data_list = []
-
-    for e in elements:
-        # get name
-        data_name = e[0:e.index("'")].strip()
-        if data_name == '':
-            data_name = name
-
-        # get data
-        point_text = e[e.index("points:'") + len("points:'"):e.index("'},")]
-        point_list = point_text.split(' ')
-        ret_list = []
-        ret_list = [-1] * int(len(point_list) / 2)
-        for i in range(0, len(ret_list)):
-            ret_list[i] = []
-            ret_list[i].append(float(point_list[i * 2]))
-            ret_list[i].append(float(point_list[i * 2 + 1]))
-
-        data_list.append(PlotData(data_name, category, ret_list))
+    if config.incremental_plot_data:
+        data_list = plot_data_cache.get_plot_data(url, response_text, name, category)
+    else:
+        data_list = []
+        for data_name, point_text in get_plot_lines(response_text, name):
+            data_list.append(PlotData.from_columns(data_name, category, *parse_point_columns(point_text)))
 
+    if time_series_store is not None:
+        for d in data_list:
+            time_series_store.add_new_points(TimeSeriesStore.get_plot_series_name(url, d.name), d.x, d.y)
     return data_list
 
 
@@ -267,22 +244,9 @@ def set_standing_data(session: requests.Session, url: str, day: int, team_standi
     # get data as text
     response_status, response_text = execute_request(session, url, f"Standing", False)
 
-    idx_start: int = response_text.index("</thead>") + len("</thead>")
-    idx_start: int = response_text.index("<tr>", idx_start) + len("<tr>")
-    idx_end: int = response_text.index("</table>", idx_start)
-    standings = response_text[idx_start:idx_end].split('<tr>')
-
-    for s in standings:
-        # get name
-        idx_start_2 = s.index("<font>") + len("<font>")
-        idx_end_2 = s.index("</font>")
-        name = s[idx_start_2:idx_end_2]
-
-        # get value
-        idx_start_2 = s.index("right>$", idx_end_2) + len("right>$")
-        idx_end_2 = s.index("</td>", idx_start_2)
-        value = float(s[idx_start_2:idx_end_2].replace(",", ""))
-
+    for name, value in TeamStandingData.get_standings_from_web_response(response_text):
+        if time_series_store is not None:
+            time_series_store.add_points(f"Standing/{name}", [day], [value])
         team_standing_data.add_point_to_team(name, (day, value))
 
 
@@ -294,275 +258,22 @@ def get_factory_data(session: requests.Session, url: str, name: str):
         return None
 
     fd = FactoryData()
-
     fd.name = name
+    return fd.init_from_web_response(response_text)
+
 
-    # capacity
-    idx_start: int = response_text.index("current capacity of ") + len("current capacity of ")
-    idx_end: int = response_text.index(".\n")
-    fd.capacity = int(float(response_text[idx_start:idx_end]))
-
-    # get configuration block
-    idx_start = response_text.index("priority level", idx_end) + len("priority level")
-    idx_start = response_text.index("<tr><td>", idx_start) + len("<tr><td>")
-    idx_end = response_text.index("</table>", idx_end)
-
-    config_text = response_text[idx_start:idx_end]
-    config_split = config_text.split("<tr><td>")
-
-    for x in config_split:
-
-        conf = ShippingConfig()
-
-        # target
-        sta = 0
-        end = x.index("</td>", sta)
-        conf.target = x[sta:end]
-
-        # shipping method
-        sta = x.index("<select ", end) + len("<select ")
-        if "value=truck selected" in x[sta:]:
-            conf.shipping_method = "Truck"
-        elif "value=mail selected" in x[sta:]:
-            conf.shipping_method = "Mail"
-        else:
-            conf.shipping_method = "NONE SELECTED"
-
-        # order point
-        sta = x.index("</select>", end)
-        sta = x.index("value=", sta) + len("value=")
-        end = x.index(">", sta)
-        conf.order_point = int(float(x[sta:end]))
-
-        # order quantity
-        sta = x.index("quant", end)
-        sta = x.index("value=", sta) + len("value=")
-        end = x.index(">", sta)
-        conf.quantity = int(float(x[sta:end]))
-
-        # priority
-        sta = x.index("priority", end)
-        sta = x.index("value=", sta) + len("value=")
-        end = x.index(">", sta)
-        conf.priority = int(float(x[sta:end]))
-
-        fd.shipping_configs.append(conf)
-    return fd
-
-
-def get_factory_configuration_summary(s: requests.Session):
-    # get factory data
-    list_factory_data = []
-    for i in range(len(values.list_of_regions)):
-        list_factory_data.append(
-            get_factory_data(s, f"https://op.responsive.net/SupplyChain/SCFactory?action=change&region={i + 1}",
-                             values.list_of_regions[i]))
-
-    # build table
-    tab = Texttable()
-    tab.set_cols_width([12, 15, 15, 15, 15, 15])
-    header = []
-    header.append("from/to")
-    content = [header]
-    for idx_region in range(len(list_factory_data)):
-        header.append(values.list_of_regions[idx_region])
-
-        line = [values.list_of_regions[idx_region]]
-        for idx_target in range(len(values.list_of_regions)):
-            if (list_factory_data[idx_region] is None) \
-                    or (list_factory_data[idx_region].shipping_configs is None) \
-                    or (len(list_factory_data[idx_region].shipping_configs) <= 0):
-                line.append(values.Placeholders.empty)
-            # not enough shipping methods -> error
-            elif len(list_factory_data[idx_region].shipping_configs) <= idx_target:
-                line.append(values.Placeholders.index_error)
-            # order point == 0 -> no orders specified
-            elif list_factory_data[idx_region].shipping_configs[idx_target].order_point == 0:
-                line.append(values.Placeholders.empty)
-            # print summary
-            else:
-                line.append(list_factory_data[idx_region].shipping_configs[idx_target].short_summary_only_values())
-        content.append(line)
-
-    tab.add_rows(content)
-    return tab.draw()
+def get_factory_configuration(s: requests.Session) -> FactoryConfiguration:
+    return factory_configuration_cache.get_configuration(
+        lambda url, name, get: execute_request(s, url, name, get))
 
 
 def get_history_data(s: requests.Session):
     history_url = "https://op.responsive.net/SupplyChain/SCHistory?isAdmin=undefined"
     response_status, response_text = execute_request(s, history_url, "History")
 
-    history = HistoryData()
-    history.init_from_web_response(response_text)
-
-    return history
-
-
-def get_warehouse_summary(mods: list[HistoryDataDefault], current_day: float):
-    headline = f"=============== WAREHOUSE MODIFICATIONS ==============="
-    header = ["Warehouse", "Day", "Finished Day", f"Days until Finished ({int(current_day)})", "New Value"]
-    output = [header]
-    for x in mods:
-        line = []
-        line.append(x.warehouse)
-        line.append(x.day)
-        line.append(x.day + values.OperationValues.warehouse_investment_days)
-        line.append(x.day + values.OperationValues.warehouse_investment_days - current_day)
-        line.append("Opening")
-        output.append(line)
-    tab = Texttable()
-    tab.set_cols_width([15, 15, 15, 15, 15])
-    tab.set_cols_align(["l", "r", "r", "r", "c"])
-    tab.add_rows(output)
-
-    return "" + headline + "\n" + tab.draw()
-
-
-def get_factory_summary(mods: list[HistoryDataDefault], current_day: float):
-    headline = f"================ FACTORY MODIFICATIONS ================"
-    header = ["Factory", "Day", "Finished Day", f"Days until Finished ({int(current_day)})", "New Value"]
-    output = [header]
-    for x in mods:
-        line = []
-        line.append(x.factory)
-        line.append(x.day)
-        line.append(x.day + values.OperationValues.factory_investment_days)
-        line.append(x.day + values.OperationValues.factory_investment_days - current_day)
-        line.append(int(float(x.value)))
-        output.append(line)
-    tab = Texttable()
-    tab.set_cols_width([15, 15, 15, 15, 15])
-    tab.set_cols_align(["l", "r", "r", "r", "r"])
-    tab.add_rows(output)
-
-    return "" + headline + "\n" + tab.draw()
-
-
-def get_pending_orders_per_region(wip_list: list[list[PlotData]]) -> dict[str, dict[str, float]]:
-    ret = {}
-    if len(wip_list) > 0:
-        idx = 0
-        for fact in wip_list:
-            ret[values.list_of_regions[idx]] = {}
-            for wh in fact:
-
-                point_tmp = wh.points[-10:-1]
-                # search in list for pending orders (from the end)
-                pending_quantity: float = 0.0
-                for point_idx in range(len(wh.points) - 2, 0, -1):
-                    if wh.points[point_idx][1] == 0:
-                        break
-                    pending_quantity += wh.points[point_idx][1]
-                # add quantity to the right dict
-                if pending_quantity > 0:
-                    ret[values.list_of_regions[idx]][wh.name] = pending_quantity
-            idx += 1
-    return ret
-
-
-def get_pending_orders_summary(wip_list: list[list[PlotData]]):
-    # get the orders
-    pending_orders = get_pending_orders_per_region(wip_list)
-
-    # generate output
-    headline = f"==================== ORDER SUMMARY ===================="
-    header = ["from / to"]
-    output = [header]
-    idx = 0
-    for x in pending_orders:
-        line = [values.list_of_regions[idx]]
-        header.append(values.list_of_regions[idx])
-        wh = pending_orders[x]
-
-        # search by region index to keep the right order
-        for i in range(len(values.list_of_regions)):
-            found = False
-            for target in wh:
-                if target == values.list_of_regions[i]:
-                    found = True
-                    line.append(wh[target])
-                    pass
-            if not found:
-                line.append(values.Placeholders.empty)
-        output.append(line)
-
-        idx += 1
-
-    tab = Texttable()
-    tab.set_cols_width([12, 12, 12, 12, 12, 12])
-    tab.set_cols_align(["l", "r", "r", "r", "r", "r"])
-    tab.add_rows(output)
-
-    return "" + headline + "\n" + tab.draw()
-
-
-def get_pending_transport_per_region(transport_list: list[list[PlotData]], today: float) -> dict[
-    str, list[tuple[float, float, float]]]:
-    ret = {}
-    if len(transport_list) > 0:
-        idx = 0
-        for region in transport_list:
-            ret[values.list_of_regions[idx]] = []
-            for inv in region:
-                if ("Mail" not in inv.name) and ("Truck" not in inv.name):
-                    continue
-
-                # search backwards to first relevant point
-                shipping_days = values.OperationValues.shipping_mail_days \
-                    if "Mail" in inv.name else values.OperationValues.shipping_truck_days
-                relevant_from = today - shipping_days
-
-                start_search_from = 0
-                for p_idx in range(len(inv.points) - 1, 0, -1):
-                    if inv.points[p_idx][0] < relevant_from:
-                        start_search_from = p_idx
-                        break
-
-                # from starting point on, register every upward change
-                for reg_idx in range(start_search_from, len(inv.points) - 1):
-                    if inv.points[reg_idx + 1][1] > inv.points[reg_idx][1]:
-                        ret[values.list_of_regions[idx]].append((inv.points[reg_idx + 1][0],
-                                                                 inv.points[reg_idx + 1][0] + shipping_days,
-                                                                 inv.points[reg_idx + 1][1] - inv.points[reg_idx][1],))
-            idx += 1
-
-    return ret
-
-
-def get_pending_transport_summary(transport_list: list[list[PlotData]], current_day: float) -> str:
-    # get the orders
-    pt = get_pending_transport_per_region(transport_list, current_day)
-
-    # generate output
-    headline = f"==================== TRANSPORT SUMMARY ===================="
-    header = ["Warehouse", "Day of Order", "Day of Arrival", f"Days until Arrival ({current_day})", "Quantity"]
-    output = [header]
-    for r in pt:
-        if len(pt[r]) <= 0:
-            continue
-        tmp = pt[r]
-
-        for l in pt[r]:
-            line = []
-            line.append(r)
-            line.append(round(l[0], 2))
-            line.append(round(l[1], 2))
-            line.append(round(l[1], 2) - current_day)
-            line.append(round(l[2], 2))
-            output.append(line)
-        pass
-
-    tab = Texttable()
-    tab.set_cols_width([12, 15, 15, 20, 12])
-    tab.set_cols_align(["l", "r", "r", "r", "r"])
-    tab.add_rows(output)
-
-    return "" + headline + "\n" + tab.draw()
-
-
-def get_history_summary(h: HistoryData, current_day: float):
-    warehouse_summary = get_warehouse_summary(h.get_pending_warehouse_modification(current_day), current_day)
-    factory_summary = get_factory_summary(h.get_pending_factory_modification(current_day), current_day)
+    history_data.update_from_web_response(response_text)
+
+    return history_data
 
 
 def get_and_store_current_state(s: requests.Session,
@@ -570,24 +281,21 @@ def get_and_store_current_state(s: requests.Session,
                                 transport_data: list[list[PlotData]],
                                 current_day: int):
     history = get_history_data(s)
-    warehouse_summary = get_warehouse_summary(history.get_pending_warehouse_modification(current_day), current_day)
-    factory_summary = get_factory_summary(history.get_pending_factory_modification(current_day), current_day)
-    factory_config_summary = get_factory_configuration_summary(s)
-    order_summary = get_pending_orders_summary(wip_data)
-    transport_summary = get_pending_transport_summary(transport_data, current_day)
-
-    mapping = (
-        (warehouse_summary, values.FilePaths.path_warehouse_output_file),
-        (factory_summary, values.FilePaths.path_factory_output_file),
-        (factory_config_summary, values.FilePaths.path_factory_configuration_output_file),
-        (order_summary, values.FilePaths.path_order_output_file),
-        (transport_summary, values.FilePaths.path_transport_output_file),
-    )
-
-    # write to files
-    for m in mapping:
-        with open(m[1], 'w', newline='') as f:
-            f.write(m[0])
+    pending_warehouse_mods = history.get_pending_warehouse_modification(current_day)
+    pending_factory_mods = history.get_pending_factory_modification(current_day)
+    factory_configuration = get_factory_configuration(s)
+
+    summary_writer.write(values.FilePaths.path_warehouse_output_file, (pending_warehouse_mods, current_day),
+                         lambda: get_warehouse_summary(pending_warehouse_mods, current_day))
+    summary_writer.write(values.FilePaths.path_factory_output_file, (pending_factory_mods, current_day),
+                         lambda: get_factory_summary(pending_factory_mods, current_day))
+    summary_writer.write(values.FilePaths.path_factory_configuration_output_file,
+                         (factory_configuration_cache.configuration_key,),
+                         lambda: factory_configuration.table)
+    summary_writer.write(values.FilePaths.path_order_output_file, (wip_data,),
+                         lambda: get_pending_orders_summary(wip_data))
+    summary_writer.write(values.FilePaths.path_transport_output_file, (transport_data, current_day),
+                         lambda: get_pending_transport_summary(transport_data, current_day))
 
 
 """
@@ -618,14 +326,16 @@ last_login = datetime.now()
 # if only logging active, only log cash of all teams
 if config.only_logging:
     while True:
+        loop_start_time = datetime.now()
         # execute new login each hour
         if last_login + timedelta(hours=1) < datetime.now():
             print_line(f"Execute new login")
             last_login = datetime.now()
             s.close()
-            s = requests.Session()
+            s = create_session()
             login(s)
 
+        response_cache.clear()
         general_data = get_general_data(s, "https://op.responsive.net/SupplyChain/SCAccess")
 
         print_line(f"Set standing... (Day {general_data.day})")
@@ -643,6 +353,9 @@ if config.only_logging:
                      "[team_color]")
         """
         set_standing_data(s, "https://op.responsive.net/SupplyChain/SCStanding", general_data.day, tsd)
+        if time_series_store is not None:
+            time_series_store.commit()
+        finish_backup_cycle()
 
         time.sleep(config.refreshEachSeconds)
         continue
@@ -662,6 +375,9 @@ plt.ion()
 
 initial_execution = True
 
+# running total of the lost demand over the whole game
+lost_demand_cumulated = CumulativePlotData()
+
 while True:
     loop_start_time = datetime.now()
     # execute new login each hour
@@ -670,13 +386,18 @@ while True:
 
         last_login = datetime.now()
         s.close()
-        s = requests.Session()
+        s = create_session()
         login(s)
 
     # Output
     timestamp = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
     print_line(f"Update data...")
 
+    refresh_start = time.perf_counter()
+    response_cache.clear()
+    plot_data_cache.reset_statistics()
+    prefetch_responses(s)
+
     general_data = get_general_data(s, "https://op.responsive.net/SupplyChain/SCAccess")
     from_day: int = general_data.day - config.lastXDays
 
@@ -695,16 +416,11 @@ while True:
     #                                     "WH 1 Inventory", Category.INVENTORY)
     plot_factory_1_wip = get_plot_data(s, "https://op.responsive.net/SupplyChain/SCPlotk?submit=plot+wip&data=WIP1",
                                        "Factory 1 WIP", Category.WIP)
-    plot_cash_balance = get_plot_data(s,
-                                      "https://op.responsive.net/SupplyChain/SCPlotk?submit=plot+cash+balance&data=BALANCE",
-                                      "Cash balance", Category.CASH)
 
     """ =============================================== """
     """ NEW """
 
     # demand
-    plot_demand_raw = get_plot_data(s, "https://op.responsive.net/SupplyChain/SCPlotk?submit=plot+demand&data=DEMAND1",
-                                    "Demand", Category.DEMAND)
     plot_lost_demand = get_plot_data(s,
                                      "https://op.responsive.net/SupplyChain/SCPlotk?submit=plot+lost+demand&data=LOST1",
                                      "Lost demand", Category.DEMAND)
@@ -727,44 +443,15 @@ while True:
                                           f"https://op.responsive.net/SupplyChain/SCPlotk?submit=plot+wip&data=WIP{r}",
                                           f"{values.list_of_regions[r - 1]} WIP", Category.WIP))
 
-    # sum up WIP per region
-    plotlist_wip_agg_inregion = []
-    for idx in range(len(plotlist_wip)):
-        plotlist_wip_agg_inregion.append(
-            PlotData.aggregate_plot_data_by_day(f"Total WIP {values.list_of_regions[idx]}", plotlist_wip[idx], from_day,
-                                                AggregateType.SUM, False, AggregateType.LAST))
-
-    # get total WIP
-    plot_wip_total = PlotData.aggregate_plot_data_by_day("Total WIP", plotlist_wip_agg_inregion, from_day,
-                                                         AggregateType.SUM, False, AggregateType.LAST)
-
-    # get aggregated inventory per region
-    plotlist_inventory_agg_inregion = []
-    idx = 0
-    for x in plotlist_inventory:
-        plotlist_inventory_agg_inregion.append(
-            PlotData.aggregate_plot_data_by_day(f"{values.list_of_regions[idx]} Total Inventory", x, from_day,
-                                                aggtype_between_lists=AggregateType.SUM, x_is_matching=False,
-                                                aggtype_in_list=AggregateType.MAX))
-        idx += 1
-
-    # get total inventory over all regions
-    plot_inventory_agg_total = []
-    plot_inventory_agg_total.append(
-        PlotData.aggregate_plot_data_by_day(f"Total Inventory", plotlist_inventory_agg_inregion, from_day,
-                                            aggtype_between_lists=AggregateType.SUM, x_is_matching=True))
-
-    # get summed up demand
-    plot_demand_summedup = PlotData.aggregate_plot_data_by_day(f"Total Demand", plot_demand, from_day,
-                                                               AggregateType.SUM)
-
-    # get summed up lost demand
-    plot_lost_demand_summedup = PlotData.aggregate_plot_data_by_day(f"Total Lost Demand", plot_lost_demand, from_day,
-                                                                    AggregateType.SUM)
-
-    # get cumulated lost demand
-    plot_lost_demand_cumulated = PlotData.cumulate_plot_data(f"Total Cumulated Lost Demand", plot_lost_demand_summedup,
-                                                             from_day)
+    aggregates = RefreshAggregates(plot_demand, plot_lost_demand, plotlist_wip, plotlist_inventory, from_day,
+                                   lost_demand_cumulated)
+    plotlist_wip_agg_inregion = aggregates.wip_per_region
+    plot_wip_total = aggregates.wip_total
+    plotlist_inventory_agg_inregion = aggregates.inventory_per_region
+    plot_inventory_agg_total = [aggregates.inventory_total]
+    plot_demand_summedup = aggregates.demand_total
+    plot_lost_demand_summedup = aggregates.lost_demand_total
+    plot_lost_demand_cumulated = aggregates.lost_demand_cumulated
 
     plot_cash_balance = get_plot_data(s,
                                       "https://op.responsive.net/SupplyChain/SCPlotk?submit=plot+cash+balance&data=BALANCE",
@@ -773,9 +460,6 @@ while True:
     for x in plot_cash_balance:
         x.multiply_all_y()
 
-    # general data
-    general_data = get_general_data(s, "https://op.responsive.net/SupplyChain/SCAccess")
-
     # team standing
     tsd = TeamStandingData()
 
@@ -927,7 +611,8 @@ while True:
     # get max demand for equal formatting of graphs
     max_demand: int = 0
     for i in range(num_of_regions):
-        region_max = max(plot_demand[i].get_from_day_y(from_day) + plot_lost_demand[i].get_from_day_y(from_day))
+        region_max = max(np.concatenate((plot_demand[i].get_from_day_y(from_day),
+                                         plot_lost_demand[i].get_from_day_y(from_day))))
         if region_max > max_demand:
             max_demand = region_max
     max_demand *= 1.2
@@ -1031,10 +716,7 @@ while True:
 
     initial_execution = False
 
-    if config.execute_backups \
-            and values.latest_backup_time + timedelta(minutes=config.backup_diff_in_minutes) < loop_start_time:
-        print_line(f"Backup executed!")
-        values.latest_backup_time = datetime.now()
+    finish_backup_cycle()
 
     if config.execute_backup_only:
         print_line(f"Executed backup. Exiting.")
@@ -1042,6 +724,11 @@ while True:
 
     plt.gcf().canvas.draw_idle()
     get_and_store_current_state(s, plotlist_wip, plotlist_inventory, general_data.day)
+    if time_series_store is not None:
+        time_series_store.commit()
+    print_line(f"Refresh done in {time.perf_counter() - refresh_start:.2f}s")
+    response_cache.print_statistics()
+    plot_data_cache.print_statistics()
 
     if config.load_from_backup:
         print_line(f"Loading from backup done")
@@ -0,0 +1,59 @@
+import values
+from aggregate_type import AggregateType
+from plot_data import PlotData, CumulativePlotData
+
+
+class RefreshAggregates:
+    """
+    Series aggregated by day from the downloaded plots of one refresh, as shown in the overview.
+    lost_demand_cumulated is the running total of the lost demand, only the days since its last update are added.
+    """
+    wip_per_region: list[PlotData]
+    wip_total: PlotData
+    inventory_per_region: list[PlotData]
+    inventory_total: PlotData
+    demand_total: PlotData
+    lost_demand_total: PlotData
+    lost_demand_cumulated: PlotData
+
+    def __init__(self, plot_demand: list[PlotData], plot_lost_demand: list[PlotData],
+                 plotlist_wip: list[list[PlotData]], plotlist_inventory: list[list[PlotData]], from_day: int,
+                 lost_demand_cumulated: CumulativePlotData):
+        # sum up WIP per region
+        self.wip_per_region = []
+        for idx in range(len(plotlist_wip)):
+            self.wip_per_region.append(
+                PlotData.aggregate_plot_data_by_day(f"Total WIP {values.list_of_regions[idx]}", plotlist_wip[idx],
+                                                    from_day, AggregateType.SUM, False, AggregateType.LAST))
+
+        # get total WIP
+        self.wip_total = PlotData.aggregate_plot_data_by_day("Total WIP", self.wip_per_region, from_day,
+                                                             AggregateType.SUM, False, AggregateType.LAST)
+
+        # get aggregated inventory per region
+        self.inventory_per_region = []
+        for idx in range(len(plotlist_inventory)):
+            self.inventory_per_region.append(
+                PlotData.aggregate_plot_data_by_day(f"{values.list_of_regions[idx]} Total Inventory",
+                                                    plotlist_inventory[idx], from_day,
+                                                    aggtype_between_lists=AggregateType.SUM, x_is_matching=False,
+                                                    aggtype_in_list=AggregateType.MAX))
+
+        # get total inventory over all regions
+        self.inventory_total = PlotData.aggregate_plot_data_by_day("Total Inventory", self.inventory_per_region,
+                                                                   from_day, aggtype_between_lists=AggregateType.SUM,
+                                                                   x_is_matching=True)
+
+        # get summed up demand
+        self.demand_total = PlotData.aggregate_plot_data_by_day("Total Demand", plot_demand, from_day,
+                                                                AggregateType.SUM)
+
+        # get summed up lost demand
+        self.lost_demand_total = PlotData.aggregate_plot_data_by_day("Total Lost Demand", plot_lost_demand, from_day,
+                                                                     AggregateType.SUM)
+
+        # get cumulated lost demand, only the days since the last refresh are added to the running total
+        lost_demand_cumulated.update(
+            PlotData.aggregate_plot_data_by_day("Total Lost Demand", plot_lost_demand,
+                                                lost_demand_cumulated.get_update_from_day() - 1, AggregateType.SUM))
+        self.lost_demand_cumulated = lost_demand_cumulated.get_from_day("Total Cumulated Lost Demand", from_day)
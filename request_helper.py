@@ -0,0 +1,159 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from string_helper import print_line
+
+
+class FetchResult:
+    url: str
+    name: str
+    get: bool
+    status: int
+    text: str
+    seconds: float
+    # exception raised by the fetch function, None if the fetch finished
+    error: str
+
+    def __init__(self, url: str, name: str, get: bool, status: int, text: str, seconds: float, error: str = None):
+        self.url = url
+        self.name = name
+        self.get = get
+        self.status = status
+        self.text = text
+        self.seconds = seconds
+        self.error = error
+
+
+class FetchSummary:
+    results: list[FetchResult]
+    seconds: float
+
+    def __init__(self, results: list[FetchResult], seconds: float):
+        self.results = results
+        self.seconds = seconds
+
+    def get_failed(self) -> list[FetchResult]:
+        return [r for r in self.results if r.error is not None]
+
+    def print_timings(self):
+        print_line(f"Fetched {len(self.results)} pages in {self.seconds:.2f}s")
+        for r in sorted(self.results, key=lambda l: l.seconds, reverse=True):
+            print_line(f"\t{r.seconds:6.2f}s\t{r.status}\t{r.name}\t{r.url}")
+
+    def print_failures(self):
+        for r in self.get_failed():
+            print_line(f"[{r.name}]\tFetch failed: {r.error}")
+
+
+class RequestCache:
+    """
+    Responses of one refresh cycle, keyed by url and method. Has to be cleared when the next cycle starts.
+    """
+    responses: dict[tuple[str, bool], tuple[int, str]]
+    hits: int
+    misses: int
+
+    def __init__(self):
+        self.responses = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.responses = {}
+            self.hits = 0
+            self.misses = 0
+
+    def get_or_fetch(self, url: str, get: bool, fetch_function: Callable[[], tuple[int, str]]) -> tuple[int, str]:
+        with self.lock:
+            if (url, get) in self.responses:
+                self.hits += 1
+                return self.responses[(url, get)]
+            self.misses += 1
+
+        response = fetch_function()
+
+        with self.lock:
+            self.responses[(url, get)] = response
+        return response
+
+    def print_statistics(self):
+        print_line(f"Request cache: {self.misses} downloads, {self.hits} hits")
+
+
+def create_session(max_workers: int = None) -> requests.Session:
+    """
+    Session with a connection pool big enough for all concurrent fetch workers
+    """
+    if max_workers is None:
+        max_workers = config.max_fetch_workers
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def download_response(session: requests.Session, url: str, name: str, get: bool = True) -> requests.Response:
+    response = None
+    retry_ctr = 0
+    while retry_ctr < config.max_retries:
+        try:
+            if get:
+                response = session.get(url, timeout=10)
+            else:
+                response = session.post(url, timeout=5)
+            break
+        except:
+            retry_ctr += 1
+            print_line(
+                f"[{name}]\tDownload not possible, try again in {config.delay_retry} seconds ({config.max_retries - retry_ctr} attempts left)")
+            time.sleep(config.delay_retry)
+    return response
+
+
+"""
+Fetches all requests with a bounded pool of worker threads.
+fetch_requests has to be in form of [(url, name, get), ...], fetch_function is called as fetch_function(url, name, get)
+and has to return (status, text). Requests with the same url and method are only fetched once.
+"""
+
+
+def fetch_concurrently(fetch_function: Callable[[str, str, bool], tuple[int, str]],
+                       fetch_requests: list[tuple[str, str, bool]],
+                       max_workers: int = None) -> FetchSummary:
+    if max_workers is None:
+        max_workers = config.max_fetch_workers
+
+    unique_requests = {}
+    for url, name, get in fetch_requests:
+        if (url, get) not in unique_requests:
+            unique_requests[(url, get)] = (url, name, get)
+
+    def timed_fetch(request: tuple[str, str, bool]) -> FetchResult:
+        url, name, get = request
+        start = time.perf_counter()
+        status, text = fetch_function(url, name, get)
+        return FetchResult(url, name, get, status, text, time.perf_counter() - start)
+
+    # a failed request must not lose the responses of the others
+    start_all = time.perf_counter()
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {executor.submit(timed_fetch, r): r for r in unique_requests.values()}
+        for future in as_completed(futures):
+            url, name, get = futures[future]
+            try:
+                results[(url, get)] = future.result()
+            except Exception as e:
+                results[(url, get)] = FetchResult(url, name, get, None, None, time.perf_counter() - start_all,
+                                                  repr(e))
+
+    return FetchSummary([results[key] for key in unique_requests], time.perf_counter() - start_all)
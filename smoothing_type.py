@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class SmoothingType(Enum):
+    SIMPLE = 0
+    EXPONENTIAL = 1
+    WEIGHTED = 2
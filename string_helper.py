@@ -1,5 +1,10 @@
+from datetime import datetime
 
 
+def print_line(line: str):
+    ts = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
+    print(f"[{ts}]\t{line}")
+
 
 def get_index(source: str, search_string: str, start = 0, add_end_ouf_found_string: bool = False):
     if source is None:
@@ -11,3 +16,10 @@ def get_index(source: str, search_string: str, start = 0, add_end_ouf_found_stri
     if add_end_ouf_found_string:
         idx += len(search_string)
     return idx
+
+
+def get_number(text: str):
+    try:
+        return float(text.replace(',', ''))
+    except ValueError:
+        return None
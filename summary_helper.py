@@ -0,0 +1,258 @@
+import hashlib
+import os
+from typing import Callable
+
+import numpy as np
+from texttable import Texttable
+
+import values
+from backup_store import write_file_atomic
+from history_data import HistoryData, HistoryDataDefault
+from plot_data import PlotData
+from factory_data import FactoryData
+
+
+def get_factory_configuration_table(list_factory_data: list[FactoryData]) -> str:
+    # build table
+    tab = Texttable()
+    tab.set_cols_width([12, 15, 15, 15, 15, 15])
+    header = []
+    header.append("from/to")
+    content = [header]
+    for idx_region in range(len(list_factory_data)):
+        header.append(values.list_of_regions[idx_region])
+
+        line = [values.list_of_regions[idx_region]]
+        for idx_target in range(len(values.list_of_regions)):
+            if (list_factory_data[idx_region] is None) \
+                    or (list_factory_data[idx_region].shipping_configs is None) \
+                    or (len(list_factory_data[idx_region].shipping_configs) <= 0):
+                line.append(values.Placeholders.empty)
+            # not enough shipping methods -> error
+            elif len(list_factory_data[idx_region].shipping_configs) <= idx_target:
+                line.append(values.Placeholders.index_error)
+            # order point == 0 -> no orders specified
+            elif list_factory_data[idx_region].shipping_configs[idx_target].order_point == 0:
+                line.append(values.Placeholders.empty)
+            # print summary
+            else:
+                line.append(list_factory_data[idx_region].shipping_configs[idx_target].short_summary_only_values())
+        content.append(line)
+
+    tab.add_rows(content)
+    return tab.draw()
+
+
+def get_warehouse_summary(mods: list[HistoryDataDefault], current_day: float):
+    headline = f"=============== WAREHOUSE MODIFICATIONS ==============="
+    header = ["Warehouse", "Day", "Finished Day", f"Days until Finished ({int(current_day)})", "New Value"]
+    output = [header]
+    for x in mods:
+        line = []
+        line.append(x.warehouse)
+        line.append(x.day)
+        line.append(x.day + values.OperationValues.warehouse_investment_days)
+        line.append(x.day + values.OperationValues.warehouse_investment_days - current_day)
+        line.append("Opening")
+        output.append(line)
+    tab = Texttable()
+    tab.set_cols_width([15, 15, 15, 15, 15])
+    tab.set_cols_align(["l", "r", "r", "r", "c"])
+    tab.add_rows(output)
+
+    return "" + headline + "\n" + tab.draw()
+
+
+def get_factory_summary(mods: list[HistoryDataDefault], current_day: float):
+    headline = f"================ FACTORY MODIFICATIONS ================"
+    header = ["Factory", "Day", "Finished Day", f"Days until Finished ({int(current_day)})", "New Value"]
+    output = [header]
+    for x in mods:
+        line = []
+        line.append(x.factory)
+        line.append(x.day)
+        line.append(x.day + values.OperationValues.factory_investment_days)
+        line.append(x.day + values.OperationValues.factory_investment_days - current_day)
+        line.append(int(x.amount) if x.amount is not None else x.value)
+        output.append(line)
+    tab = Texttable()
+    tab.set_cols_width([15, 15, 15, 15, 15])
+    tab.set_cols_align(["l", "r", "r", "r", "r"])
+    tab.add_rows(output)
+
+    return "" + headline + "\n" + tab.draw()
+
+
+def get_pending_orders_per_region(wip_list: list[list[PlotData]]) -> dict[str, dict[str, float]]:
+    ret = {}
+    if len(wip_list) > 0:
+        idx = 0
+        for fact in wip_list:
+            ret[values.list_of_regions[idx]] = {}
+            for wh in fact:
+                # search in list for pending orders (from the end)
+                pending_quantity: float = 0.0
+                for point_idx in range(len(wh.y) - 2, 0, -1):
+                    if wh.y[point_idx] == 0:
+                        break
+                    pending_quantity += wh.y[point_idx]
+                # add quantity to the right dict
+                if pending_quantity > 0:
+                    ret[values.list_of_regions[idx]][wh.name] = pending_quantity
+            idx += 1
+    return ret
+
+
+def get_pending_orders_summary(wip_list: list[list[PlotData]]):
+    # get the orders
+    pending_orders = get_pending_orders_per_region(wip_list)
+
+    # generate output
+    headline = f"==================== ORDER SUMMARY ===================="
+    header = ["from / to"]
+    output = [header]
+    idx = 0
+    for x in pending_orders:
+        line = [values.list_of_regions[idx]]
+        header.append(values.list_of_regions[idx])
+        wh = pending_orders[x]
+
+        # search by region index to keep the right order
+        for i in range(len(values.list_of_regions)):
+            found = False
+            for target in wh:
+                if target == values.list_of_regions[i]:
+                    found = True
+                    line.append(wh[target])
+                    pass
+            if not found:
+                line.append(values.Placeholders.empty)
+        output.append(line)
+
+        idx += 1
+
+    tab = Texttable()
+    tab.set_cols_width([12, 12, 12, 12, 12, 12])
+    tab.set_cols_align(["l", "r", "r", "r", "r", "r"])
+    tab.add_rows(output)
+
+    return "" + headline + "\n" + tab.draw()
+
+
+def get_pending_transport_per_region(transport_list: list[list[PlotData]], today: float) -> dict[
+    str, list[tuple[float, float, float]]]:
+    ret = {}
+    if len(transport_list) > 0:
+        idx = 0
+        for region in transport_list:
+            ret[values.list_of_regions[idx]] = []
+            for inv in region:
+                if ("Mail" not in inv.name) and ("Truck" not in inv.name):
+                    continue
+
+                # search backwards to first relevant point
+                shipping_days = values.OperationValues.shipping_mail_days \
+                    if "Mail" in inv.name else values.OperationValues.shipping_truck_days
+                relevant_from = today - shipping_days
+
+                start_search_from = 0
+                for p_idx in range(len(inv.x) - 1, 0, -1):
+                    if inv.x[p_idx] < relevant_from:
+                        start_search_from = p_idx
+                        break
+
+                # from starting point on, register every upward change
+                for reg_idx in range(start_search_from, len(inv.x) - 1):
+                    if inv.y[reg_idx + 1] > inv.y[reg_idx]:
+                        ret[values.list_of_regions[idx]].append((inv.x[reg_idx + 1],
+                                                                 inv.x[reg_idx + 1] + shipping_days,
+                                                                 inv.y[reg_idx + 1] - inv.y[reg_idx],))
+            idx += 1
+
+    return ret
+
+
+def get_pending_transport_summary(transport_list: list[list[PlotData]], current_day: float) -> str:
+    # get the orders
+    pt = get_pending_transport_per_region(transport_list, current_day)
+
+    # generate output
+    headline = f"==================== TRANSPORT SUMMARY ===================="
+    header = ["Warehouse", "Day of Order", "Day of Arrival", f"Days until Arrival ({current_day})", "Quantity"]
+    output = [header]
+    for r in pt:
+        if len(pt[r]) <= 0:
+            continue
+        tmp = pt[r]
+
+        for l in pt[r]:
+            line = []
+            line.append(r)
+            line.append(round(l[0], 2))
+            line.append(round(l[1], 2))
+            line.append(round(l[1], 2) - current_day)
+            line.append(round(l[2], 2))
+            output.append(line)
+        pass
+
+    tab = Texttable()
+    tab.set_cols_width([12, 15, 15, 20, 12])
+    tab.set_cols_align(["l", "r", "r", "r", "r"])
+    tab.add_rows(output)
+
+    return "" + headline + "\n" + tab.draw()
+
+
+def get_history_summary(h: HistoryData, current_day: float):
+    warehouse_summary = get_warehouse_summary(h.get_pending_warehouse_modification(current_day), current_day)
+    factory_summary = get_factory_summary(h.get_pending_factory_modification(current_day), current_day)
+
+
+def update_input_hash(h, data):
+    if isinstance(data, PlotData):
+        h.update(data.name.encode())
+        h.update(data.x.tobytes())
+        h.update(data.y.tobytes())
+    elif isinstance(data, HistoryDataDefault):
+        h.update(repr(data.get_key()).encode())
+    elif isinstance(data, (list, tuple)):
+        h.update(f"[{len(data)}".encode())
+        for x in data:
+            update_input_hash(h, x)
+        h.update(b"]")
+    elif isinstance(data, np.ndarray):
+        h.update(data.tobytes())
+    else:
+        h.update(repr(data).encode())
+
+
+def get_input_hash(*inputs) -> bytes:
+    h = hashlib.sha1()
+    update_input_hash(h, inputs)
+    return h.digest()
+
+
+class SummaryWriter:
+    """
+    Writes every summary to its output file, but only builds and writes it again if its inputs changed
+    (or the file is missing). Files are replaced atomically, so readers never see a half written table.
+    """
+    input_hashes: dict[str, bytes]
+    written: int
+    skipped: int
+
+    def __init__(self):
+        self.input_hashes = {}
+        self.written = 0
+        self.skipped = 0
+
+    def write(self, path: str, inputs: tuple, build_summary: Callable[[], str]) -> bool:
+        input_hash = get_input_hash(*inputs)
+        if self.input_hashes.get(path) == input_hash and os.path.exists(path):
+            self.skipped += 1
+            return False
+
+        write_file_atomic(path, build_summary().encode())
+        self.input_hashes[path] = input_hash
+        self.written += 1
+        return True
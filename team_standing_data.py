@@ -1,19 +1,32 @@
 import csv
+import os
+
+import numpy as np
 
 import config
+from csv_log_writer import CsvLogWriters, get_binary_path
 
 
 class TeamStandingData:
     teams: dict = {}
     own_team: str = "" #TODO: fill out own team name so it's not logged twice
 
+    # teams are only loaded once per process and kept across refreshes (key: csv_path)
+    loaded_teams: dict = {}
+
     def __init__(self):
         self.teams = {}
     """
     Team_values has to be in form of (team_name, csv_path)
     """
     def add_team(self, team_name: str, csv_path: str, csv_path_raw: str, color: str):
-        td = TeamData(team_name, csv_path, csv_path_raw, color).init_from_csv()
+        td = TeamStandingData.loaded_teams.get(csv_path)
+        if td is None:
+            td = TeamData(team_name, csv_path, csv_path_raw, color).init_from_csv()
+            TeamStandingData.loaded_teams[csv_path] = td
+        td.name = team_name
+        td.csv_path_raw = csv_path_raw
+        td.color = color
         self.teams[team_name] = td
         return self
 
@@ -21,80 +34,150 @@ class TeamStandingData:
         if not team_name == self.own_team:
             self.teams[team_name].add_data_point(point)
 
+    """
+    Returns (team_name, cash) for every team of the standing page
+    """
+
+    @staticmethod
+    def get_standings_from_web_response(response_text: str) -> list[tuple[str, float]]:
+        ret = []
+        idx_start: int = response_text.index("</thead>") + len("</thead>")
+        idx_start: int = response_text.index("<tr>", idx_start) + len("<tr>")
+        idx_end: int = response_text.index("</table>", idx_start)
+        standings = response_text[idx_start:idx_end].split('<tr>')
+
+        for s in standings:
+            # get name
+            idx_start_2 = s.index("<font>") + len("<font>")
+            idx_end_2 = s.index("</font>")
+            name = s[idx_start_2:idx_end_2]
+
+            # get value
+            idx_start_2 = s.index("right>$", idx_end_2) + len("right>$")
+            idx_end_2 = s.index("</td>", idx_start_2)
+            value = float(s[idx_start_2:idx_end_2].replace(",", ""))
+
+            ret.append((name, value))
+        return ret
+
 
 
 class TeamData:
+    """
+    Datapoints are accumulated as (sum, count) per day, the averaged datapoints (and their sorted day and value
+    columns for range queries) are only built when they are read.
+    When loaded from file, only the columns are set and the sums per day are built with the first added point.
+    """
     name: str
-    datapoints: list
+    day_sums: dict[float, list]
+    averaged_datapoints: list
+    days: np.ndarray
+    averages: np.ndarray
     csv_path: str
     csv_path_raw: str
     color: str
 
     def __init__(self, name: str, csv_path: str, csv_path_raw: str, color: str):
         self.name = name
-        self.datapoints = []
+        self.day_sums = {}
+        self.averaged_datapoints = None
+        self.days = None
+        self.averages = None
         self.csv_path = csv_path
         self.csv_path_raw = csv_path_raw
         self.color = color
 
+    @property
+    def datapoints(self) -> list:
+        return self.get_averaged_datapoints()
 
     def init_from_csv(self):
+        binary_path = get_binary_path(self.csv_path)
+        if config.use_binary_sidecar and os.path.exists(binary_path) \
+                and os.path.getmtime(binary_path) >= os.path.getmtime(self.csv_path):
+            self.init_from_binary(binary_path)
+            return self
+
         with open(self.csv_path, 'r') as f:
             reader = csv.reader(f, delimiter=',')
             for row in reader:
-                self.datapoints.append((float(row[0]), float(row[1])))
-            self.datapoints = self.get_averaged_datapoints()
+                self.accumulate((float(row[0]), float(row[1])))
+        # runs from a backup do not write to the outputs
+        if not config.load_from_backup:
+            CsvLogWriters.get_averaged_writer(self.csv_path).write_binary_all(self.get_averaged_datapoints())
         return self
 
+    def init_from_binary(self, binary_path: str):
+        # read into memory instead of mapping the file, a mapped file can not be replaced on Windows
+        columns = np.fromfile(binary_path, dtype=np.float64).reshape(-1, 2)
+        self.day_sums = None
+        self.averaged_datapoints = None
+        self.days = columns[:, 0]
+        self.averages = columns[:, 1]
+
+    def accumulate(self, point: tuple):
+        if self.day_sums is None:
+            self.day_sums = {}
+            for day, average in zip(self.days.tolist(), self.averages.tolist()):
+                self.day_sums[day] = [average, 1]
+
+        day_sum = self.day_sums.get(point[0])
+        if day_sum is None:
+            self.day_sums[point[0]] = [point[1], 1]
+        else:
+            day_sum[0] += point[1]
+            day_sum[1] += 1
+        self.averaged_datapoints = None
+        self.days = None
+        self.averages = None
+
+    def get_day_average(self, day: float) -> tuple:
+        day_sum = self.day_sums[day]
+        return day, float(day_sum[0]) / day_sum[1]
 
     def add_data_point(self, point: tuple):
         if not config.load_from_backup:
-            self.datapoints.append(point)
-            self.datapoints = self.get_averaged_datapoints()
-            self.write_to_csv(self.csv_path, self.datapoints)
-            self.write_to_csv_raw(self.csv_path_raw, point)
+            self.accumulate(point)
+            CsvLogWriters.get_averaged_writer(self.csv_path).write_day(self.get_day_average(point[0]),
+                                                                       self.get_averaged_datapoints)
+            CsvLogWriters.get_raw_writer(self.csv_path_raw).write_row(point)
 
 
     def add_multiple_data_points(self, points: list):
         if not config.load_from_backup:
             for x in points:
-                self.datapoints.append(x)
-                self.write_to_csv_raw(self.csv_path_raw, x)
-            self.datapoints = self.get_averaged_datapoints()
-            self.write_to_csv(self.csv_path, self.datapoints)
+                self.accumulate(x)
+                CsvLogWriters.get_raw_writer(self.csv_path_raw).write_row(x)
+            CsvLogWriters.get_averaged_writer(self.csv_path).write_all(self.get_averaged_datapoints())
 
 
     def get_averaged_datapoints(self):
-        datapoints_sorted = sorted(self.datapoints,key=lambda l:l[0])
-        datapoints_result = []
+        if self.averaged_datapoints is None:
+            if self.day_sums is None:
+                self.averaged_datapoints = list(zip(self.days.tolist(), self.averages.tolist()))
+            else:
+                self.averaged_datapoints = [self.get_day_average(day) for day in sorted(self.day_sums)]
+        return self.averaged_datapoints
+
+    def get_columns(self) -> tuple[np.ndarray, np.ndarray]:
+        if self.days is None:
+            columns = np.array(self.get_averaged_datapoints(), dtype=np.float64).reshape(-1, 2)
+            self.days = columns[:, 0].copy()
+            self.averages = columns[:, 1].copy()
+        return self.days, self.averages
 
-        idx: int = 0
-        while idx < len(datapoints_sorted):
-            day: int = datapoints_sorted[idx][0]
-            sum: int = datapoints_sorted[idx][1]
-            counter: int = 1
-            idx += 1
-
-            while (idx < len(datapoints_sorted)) and (day == datapoints_sorted[idx][0]):
-                sum += datapoints_sorted[idx][1]
-                idx += 1
-                counter += 1
-
-            avg: float = float(sum) / counter if counter > 0 else sum
-            datapoints_result.append((day, avg))
+    """
+    Returns days and averaged values from from_day to to_day (both included) in ascending order
+    """
 
-        return datapoints_result
+    def get_datapoints_range(self, from_day: float, to_day: float = None) -> tuple[np.ndarray, np.ndarray]:
+        days, averages = self.get_columns()
+        idx_start = np.searchsorted(days, from_day, side="left")
+        idx_end = len(days) if to_day is None else np.searchsorted(days, to_day, side="right")
+        return days[idx_start:idx_end], averages[idx_start:idx_end]
 
     def get_datapoints_seperated(self, from_day: int):
-        x: list = []
-        y: list = []
-
-        idx = len(self.datapoints)-1
-        while idx >= 0 and self.datapoints[idx][0] >= from_day:
-            x.append(self.datapoints[idx][0])
-            y.append(self.datapoints[idx][1])
-            idx -= 1
-        return x,y
+        return self.get_datapoints_range(from_day)
 
     @staticmethod
     def write_to_csv(path: str, data: []):
@@ -0,0 +1,83 @@
+import sqlite3
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+
+class TimeSeriesStore:
+    """
+    Values of all series by day in one SQLite database. Points added during a refresh are buffered and inserted in a
+    single transaction by commit().
+    """
+    path: str
+    last_days: dict[str, float]
+    pending_rows: list[tuple[str, float, float]]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS series_values ("
+                                    "series TEXT NOT NULL, day REAL NOT NULL, value REAL NOT NULL)")
+            # covering index, range queries are answered from the index only
+            self.connection.execute("CREATE INDEX IF NOT EXISTS series_values_series_day "
+                                    "ON series_values (series, day, value)")
+        self.last_days = dict(self.connection.execute("SELECT series, MAX(day) FROM series_values GROUP BY series"))
+        self.pending_rows = []
+
+    """
+    Name of a line of a plot, independent of the display name the plot was requested with:
+    the data parameter of the url (e.g. WIP1) and the name of the line
+    """
+
+    @staticmethod
+    def get_plot_series_name(url: str, line_name: str) -> str:
+        data = parse_qs(urlparse(url).query).get("data", [url])[0]
+        return f"{data}/{line_name}"
+
+    """
+    Adds all points, e.g. for values sampled on every refresh
+    """
+
+    def add_points(self, series: str, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if len(x) <= 0:
+            return
+        self.pending_rows.extend(zip([series] * len(x), x.tolist(), y.tolist()))
+        self.last_days[series] = max(self.last_days.get(series, float("-inf")), float(np.max(x)))
+
+    """
+    Only adds the points after the last stored day of the series, e.g. for series downloaded completely on each refresh
+    """
+
+    def add_new_points(self, series: str, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if series in self.last_days:
+            is_new = x > self.last_days[series]
+            x, y = x[is_new], y[is_new]
+        self.add_points(series, x, y)
+
+    def commit(self):
+        if len(self.pending_rows) <= 0:
+            return
+        with self.connection:
+            self.connection.executemany("INSERT INTO series_values (series, day, value) VALUES (?, ?, ?)",
+                                        self.pending_rows)
+        self.pending_rows = []
+
+    def get_series_names(self) -> list[str]:
+        return sorted(self.last_days)
+
+    def get_range(self, series: str, from_day: float = float("-inf"), to_day: float = float("inf")) \
+            -> tuple[np.ndarray, np.ndarray]:
+        rows = self.connection.execute("SELECT day, value FROM series_values "
+                                       "WHERE series = ? AND day >= ? AND day <= ? ORDER BY day",
+                                       (series, from_day, to_day)).fetchall()
+        columns = np.array(rows, dtype=np.float64).reshape(-1, 2)
+        return columns[:, 0].copy(), columns[:, 1].copy()
+
+    def close(self):
+        self.commit()
+        self.connection.close()
@@ -21,6 +21,35 @@ class FilePaths:
     website_backup_directory = r"website_backups_continuously"
 
 
+def get_plot_requests() -> list[tuple[str, str, "Category"]]:
+    plot_requests = [
+        ("https://op.responsive.net/SupplyChain/SCPlotk?submit=plot+demand&data=DEMAND1", "Demand", Category.DEMAND),
+        ("https://op.responsive.net/SupplyChain/SCPlotk?submit=plot+lost+demand&data=LOST1", "Lost demand",
+         Category.DEMAND),
+        ("https://op.responsive.net/SupplyChain/SCPlotk?submit=plot+shipments&data=SHIP1SEG1", "Met demand",
+         Category.DEMAND),
+        ("https://op.responsive.net/SupplyChain/SCPlotk?submit=plot+cash+balance&data=BALANCE", "Cash balance",
+         Category.CASH),
+    ]
+    for r in range(1, len(list_of_regions) + 1):
+        plot_requests.append((f"https://op.responsive.net/SupplyChain/SCPlotk?submit=plot+inventory&data=WH{r}",
+                              f"{list_of_regions[r - 1]} Inventory", Category.INVENTORY))
+        plot_requests.append((f"https://op.responsive.net/SupplyChain/SCPlotk?submit=plot+wip&data=WIP{r}",
+                              f"{list_of_regions[r - 1]} WIP", Category.WIP))
+    return plot_requests
+
+
+def get_refresh_requests() -> list[tuple[str, str, bool]]:
+    refresh_requests = [(url, name, True) for url, name, category in get_plot_requests()]
+    refresh_requests.append(("https://op.responsive.net/SupplyChain/SCAccess", "GeneralData", True))
+    refresh_requests.append(("https://op.responsive.net/SupplyChain/SCStanding", "Standing", False))
+    refresh_requests.append(("https://op.responsive.net/SupplyChain/SCHistory?isAdmin=undefined", "History", True))
+    for r in range(1, len(list_of_regions) + 1):
+        refresh_requests.append((f"https://op.responsive.net/SupplyChain/SCFactory?action=change&region={r}",
+                                 list_of_regions[r - 1], True))
+    return refresh_requests
+
+
 class OperationValues:
     factory_investment_days: int = 90
     warehouse_investment_days: int = 60
@@ -50,22 +79,31 @@ class HistoryOperationTypes(Enum):
 
     UNDEFINED = 99
 
+# checked in this order, the first contained text decides the type
+history_operation_type_texts: list[tuple[str, HistoryOperationTypes]] = [
+    ("Shipping", HistoryOperationTypes.SHIPPING),
+    ("Satisfy demand in", HistoryOperationTypes.SERVE_REGION),
+    ("Schedule warehouse", HistoryOperationTypes.SCHEDULE_WAREHOUSE),
+    ("Schedule capacity change", HistoryOperationTypes.SCHEDULE_FACTORY),
+    ("Fulfillment policy", HistoryOperationTypes.FULFILLMENT_POLICY),
+    ("Order point", HistoryOperationTypes.ORDER_POINT),
+    ("Order quantity", HistoryOperationTypes.ORDER_QUANTITY),
+    ("Order priority", HistoryOperationTypes.ORDER_PRIORITY),
+]
+
+# the history only contains a few distinct operation texts
+history_operation_types_by_text: dict[str, HistoryOperationTypes] = {}
+
+
 def get_history_operation_type(type_string: str) -> HistoryOperationTypes:
-    if "Shipping" in type_string:
-        return HistoryOperationTypes.SHIPPING
-    elif "Satisfy demand in" in type_string:
-        return HistoryOperationTypes.SERVE_REGION
-    elif "Schedule warehouse" in type_string:
-        return HistoryOperationTypes.SCHEDULE_WAREHOUSE
-    elif "Schedule capacity change" in type_string:
-        return HistoryOperationTypes.SCHEDULE_FACTORY
-    elif "Fulfillment policy" in type_string:
-        return HistoryOperationTypes.FULFILLMENT_POLICY
-    elif "Order point" in type_string:
-        return HistoryOperationTypes.ORDER_POINT
-    elif "Order quantity" in type_string:
-        return HistoryOperationTypes.ORDER_QUANTITY
-    elif "Order priority" in type_string:
-        return HistoryOperationTypes.ORDER_PRIORITY
-    else:
-        return HistoryOperationTypes.UNDEFINED
+    operation_type = history_operation_types_by_text.get(type_string)
+    if operation_type is not None:
+        return operation_type
+
+    operation_type = HistoryOperationTypes.UNDEFINED
+    for text, t in history_operation_type_texts:
+        if text in type_string:
+            operation_type = t
+            break
+    history_operation_types_by_text[type_string] = operation_type
+    return operation_type